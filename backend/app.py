@@ -1,43 +1,81 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import cloudinary
 import cloudinary.uploader
-import bcrypt, jwt, os
+import cloudinary.api
+import bcrypt, jwt, os, re, hashlib, hmac, threading, time, base64, csv, io, json, logging
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from bson import ObjectId
+from bson.errors import InvalidId
+from catalog_cache import cache_from_env
+from catalog_search import SearchIndexHolder, SEARCH_FIELDS, RESULT_FIELDS, PRICE_BANDS
+from machine_codes import next_machine_code, ensure_code_setup
+from db_indexes import ensure_indexes
+import dashboard_stats
+import uploads
+import image_cleanup
+from json_provider import BSONJSONProvider, stream_array
+import json_provider
+from static_assets import StaticAssets, precompress
+import auth
+from enquiry_ingest import TokenBucketLimiter, DuplicateFilter, EnquiryBuffer
+from pymongo.errors import DuplicateKeyError
+from mongo import LazyMongo, LazyDatabase
+import metrics
 
 load_dotenv()
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+log = logging.getLogger("heavyhorizon")
+
 # Use absolute path for static files
 base_dir = os.path.abspath(os.path.dirname(__file__))
 static_folder = os.path.join(base_dir, 'dist')
-print(f"DEBUG: Static folder is {static_folder}")
+log.debug("Static folder is %s", static_folder)
 
-app = Flask(__name__, static_folder=static_folder, static_url_path='/')
+# dist/ is served by StaticAssets (see SERVE FRONTEND) instead of Flask's static view
+app = Flask(__name__, static_folder=None)
+# ObjectId / datetime / Decimal128 aware encoding for every response
+app.json = BSONJSONProvider(app)
 CORS(app) # Simplified CORS for same-origin deployment
+# Number of reverse proxies in front of the app. X-Forwarded-For is only
+# trusted for that many hops, so clients can't pick their own remote_addr.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+# Per-route latency/size histograms and per-request Mongo time (see /metrics)
+metrics.instrument_flask(app)
 
 
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
-# MongoDB
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["heavyhorizon"]
-
-machines = db["machines"]
-blogs = db["blogs"]
-parts = db["parts"]
-enquiries = db["enquiries"]
-admins = db["admins"]
-
-# Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+# MongoDB: the client is created on first use, not at import (see STARTUP)
+# Times every command and attributes it to the current request
+mongo_listener = metrics.MongoCommandTimer()
+mongo_options = {"event_listeners": [mongo_listener]}
+if os.getenv("MONGO_MAX_POOL_SIZE"):
+    mongo_options["maxPoolSize"] = int(os.getenv("MONGO_MAX_POOL_SIZE"))
+if os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"):
+    mongo_options["serverSelectionTimeoutMS"] = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"))
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "heavyhorizon")
+mongo = LazyMongo(db_name=MONGO_DB_NAME, **mongo_options)
+db = LazyDatabase(mongo)
+
+machines = db.collection("machines")
+blogs = db.collection("blogs")
+parts = db.collection("parts")
+enquiries = db.collection("enquiries")
+admins = db.collection("admins")
+catalog_meta = db.collection("catalog_meta")
+
+# Public catalog reads are served from this cache; admin writes invalidate it
+catalog_cache = cache_from_env()
 
 # ---------------- AUTH ----------------
 def token_required(f):
@@ -48,98 +86,424 @@ def token_required(f):
             # If a browser navigates to a protected route directly (like /admin/enquiries)
             # serve the frontend so React Router can handle the login redirect UI
             if request.method == "GET" and "text/html" in request.headers.get("Accept", ""):
-                return send_from_directory(app.static_folder, 'index.html')
+                return assets.index_response()
             return jsonify({"error": "Token missing"}), 401
         try:
             token_val = token.split(" ")[1] if " " in token else token
-            jwt.decode(token_val, app.config["SECRET_KEY"], algorithms=["HS256"])
-        except:
+            auth.verify_token(token_val, app.config["SECRET_KEY"])
+        except jwt.InvalidTokenError as e:
             if request.method == "GET" and "text/html" in request.headers.get("Accept", ""):
-                return send_from_directory(app.static_folder, 'index.html')
+                return assets.index_response()
+            if isinstance(e, jwt.ExpiredSignatureError):
+                return jsonify({"error": "Token expired"}), 401
+            log.debug("Rejected token: %s", e)
             return jsonify({"error": "Invalid token"}), 401
         return f(*args, **kwargs)
     return wrapper
 
-# Create admin once
-if not admins.find_one({"email": os.getenv("ADMIN_EMAIL")}):
+login_guard = auth.login_guard_from_env()
+
+def bootstrap_admin():
+    """Creates the ADMIN_EMAIL account once. Run via `flask --app app create-admin`."""
+    email = os.getenv("ADMIN_EMAIL")
+    if not email or not os.getenv("ADMIN_PASSWORD"):
+        log.error("ADMIN_EMAIL and ADMIN_PASSWORD must be set")
+        return False
+    if admins.find_one({"email": email}):
+        return False
     admins.insert_one({
-        "email": os.getenv("ADMIN_EMAIL"),
+        "email": email,
         "password": bcrypt.hashpw(os.getenv("ADMIN_PASSWORD").encode(), bcrypt.gensalt())
     })
+    return True
+
+@app.cli.command("create-admin")
+def create_admin_command():
+    """Create the admin account from ADMIN_EMAIL / ADMIN_PASSWORD if missing."""
+    print("Admin created" if bootstrap_admin() else "Admin not created (exists or env missing)")
 
 # ---------------- ADMIN LOGIN ----------------
 @app.route("/admin/login", methods=["POST"])
 def admin_login():
-    data = request.json
-    admin = admins.find_one({"email": data["email"]})
-    if admin and bcrypt.checkpw(data["password"].encode(), admin["password"]):
+    data = request.get_json(silent=True) or {}
+    email = str(data.get("email") or "")
+    password = str(data.get("password") or "")
+    if not email or not password:
+        return jsonify({"error": "Invalid credentials"}), 401
+
+    try:
+        # bcrypt runs on login_guard's own pool, capped and with per-account lockout
+        login_guard.check_lockout(email)
+        admin = admins.find_one({"email": email})
+        ok = login_guard.check_password(email, password, admin["password"] if admin else None)
+    except auth.LoginLocked as e:
+        resp = jsonify({"error": "Too many failed attempts, try again later"})
+        resp.headers["Retry-After"] = str(int(e.retry_after) + 1)
+        return resp, 429
+    except auth.LoginBusy:
+        resp = jsonify({"error": "Login is busy, try again shortly"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+
+    if ok:
         token = jwt.encode({
             "email": admin["email"],
-            "exp": datetime.utcnow() + timedelta(hours=8)
+            "exp": datetime.now(timezone.utc) + timedelta(hours=8)
         }, app.config["SECRET_KEY"], algorithm="HS256")
         return jsonify({"token": token})
     return jsonify({"error": "Invalid credentials"}), 401
 
 # ---------------- IMAGE UPLOAD ----------------
+def upload_to_cloudinary(file):
+    if uploads.file_size(file) > uploads.UPLOAD_CHUNK_BYTES:
+        # upload() would read the whole file into memory; this sends it a chunk at a time.
+        # upload_large defaults to a raw asset, which can't be transformed or
+        # deleted by the image outbox
+        result = cloudinary.uploader.upload_large(
+            file.stream, folder="heavy_horizon", filename=file.filename,
+            chunk_size=uploads.UPLOAD_CHUNK_BYTES, resource_type="image"
+        )
+        if "/image/upload/" not in (result or {}).get("secure_url", ""):
+            raise ValueError(f"Chunked upload of {file.filename} did not produce an image: {(result or {}).get('secure_url')}")
+        return result
+    return cloudinary.uploader.upload(file, folder="heavy_horizon")
+
+# Swappable so the upload route can run against a local stub
+app.config["IMAGE_UPLOADER"] = upload_to_cloudinary
+# Oversized requests are rejected with a 413 before the body is parsed
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv(
+    "UPLOAD_MAX_REQUEST_BYTES", uploads.UPLOAD_MAX_FILES * uploads.UPLOAD_MAX_FILE_BYTES
+))
+
 @app.route("/admin/upload", methods=["POST"])
 @token_required
 def upload_images():
+    """
+    Uploads all files concurrently. By default returns the list of URLs (and
+    a 502 if any file failed). With ?detailed=1 returns per-file results in
+    the original order, with 207 for a partial failure.
+    """
     files = request.files.getlist("images")
-    urls = []
-    for file in files:
-        res = cloudinary.uploader.upload(file, folder="heavy_horizon")
-        # Return only the URL as requested
-        urls.append(res["secure_url"])
-    return jsonify(urls)
-
-# Helper for Cloudinary Cleanup
+    try:
+        uploads.check_limits(files)
+    except uploads.UploadLimitError as e:
+        return jsonify({"error": str(e)}), 400
+
+    uploader = metrics.timed_cloudinary("upload", app.config["IMAGE_UPLOADER"])
+    results = uploads.upload_all(files, uploader)
+    body, status = upload_response_body(results, request.args.get("detailed") in ("1", "true"))
+    return jsonify(body), status
+
+def upload_response_body(results, detailed):
+    failed = sum(1 for res in results if "error" in res)
+    if detailed:
+        status = 200 if not failed else (502 if failed == len(results) else 207)
+        return {"results": results, "uploaded": len(results) - failed, "failed": failed}, status
+    if failed:
+        return {"error": f"{failed} of {len(results)} uploads failed", "results": results}, 502
+    # Return only the URLs as requested
+    return [res["url"] for res in results], 200
+
+# Cloudinary cleanup goes through the image_deletions outbox; the request
+# only records what to delete and the worker below talks to Cloudinary
 def delete_cloudinary_images(image_list):
+    try:
+        image_cleanup.enqueue(db, image_list)
+    except Exception as e:
+        log.error("Failed to queue Cloudinary image deletion: %s", e)
+
+def document_images(collection_name, doc):
+    """Every Cloudinary image a catalog document references."""
+    images = doc.get("images") or []
+    if not isinstance(images, list):
+        images = [images]
+    images = list(images)
+    # Parts keep a single "image", blogs a featured_image that may also be in images
+    extra = doc.get("image") if collection_name == "parts" else doc.get("featured_image") if collection_name == "blogs" else None
+    if extra and isinstance(extra, (str, dict)) and extra not in images:
+        images.append(extra)
+    return images
+
+def catalog_doc_deleted(collection_name, doc_id, doc):
+    """Bookkeeping after a find_one_and_delete; doc is None if nothing was deleted."""
+    catalog_changed(collection_name, doc_id)
+    if doc:
+        dashboard_stats.bump(db, **{collection_name: -1})
+        delete_cloudinary_images(document_images(collection_name, doc))
+
+# ---------------- HTTP CACHING ----------------
+# Every catalog collection has a version in catalog_meta that the admin write
+# routes bump. ETags are derived from it, so conditional requests can be
+# answered with a 304 without touching the collection itself.
+CATALOG_VERSIONS_ID = "catalog_versions"
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", 5))
+
+CACHE_CONTROL = {
+    "list": os.getenv("CACHE_CONTROL_LIST", "public, max-age=60, stale-while-revalidate=300"),
+    "detail": os.getenv("CACHE_CONTROL_DETAIL", "public, max-age=300, stale-while-revalidate=600"),
+}
+
+_versions_lock = threading.Lock()
+_versions_state = {"fetched_at": 0.0, "doc": {}}
+
+def cached_catalog_versions():
+    """The last versions read, or None once they are older than CATALOG_VERSION_TTL."""
+    with _versions_lock:
+        if time.monotonic() - _versions_state["fetched_at"] < CATALOG_VERSION_TTL:
+            return _versions_state["doc"]
+    return None
+
+def store_catalog_versions(doc):
     """
-    Deletes images from Cloudinary based on an array of image URLs.
-    Extracts public_id from URL if possible.
+    Records a freshly read catalog_versions document. Seeing a version change
+    made by another worker drops this worker's cached entries for that
+    collection. A collection with no version yet counts as version 0, so
+    its first bump invalidates too.
     """
-    if not image_list or not isinstance(image_list, list):
-        return
+    doc = dict(doc or {})
+    doc.pop("_id", None)
+    with _versions_lock:
+        previous = _versions_state["doc"]
+        for name, info in doc.items():
+            if previous.get(name, {}).get("version", 0) != info.get("version", 0):
+                catalog_cache.invalidate_collection(name)
+        _versions_state["doc"] = doc
+        _versions_state["fetched_at"] = time.monotonic()
+    return doc
+
+def catalog_versions():
+    """
+    Returns {collection: {"version": int, "updatedAt": datetime}} read from
+    catalog_meta, re-read at most every CATALOG_VERSION_TTL seconds per
+    worker.
+    """
+    doc = cached_catalog_versions()
+    if doc is None:
+        doc = store_catalog_versions(catalog_meta.find_one({"_id": CATALOG_VERSIONS_ID}))
+    return doc
+
+def catalog_changed(collection_name, doc_id=None):
+    """Called by admin writes: drops cached reads and bumps the collection version."""
+    catalog_cache.invalidate(collection_name, doc_id)
+    try:
+        catalog_meta.update_one(
+            {"_id": CATALOG_VERSIONS_ID},
+            {
+                "$inc": {f"{collection_name}.version": 1},
+                "$set": {f"{collection_name}.updatedAt": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+    except Exception as e:
+        log.error("Failed to bump %s version: %s", collection_name, e)
+    with _versions_lock:
+        _versions_state["fetched_at"] = 0.0
+
+def catalog_validators(collection_name, info, variant):
+    """ETag and Last-Modified for one response variant of a catalog collection."""
+    version = info.get("version", 0)
+    updated_at = info.get("updatedAt")
+    if updated_at is not None and updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+    return f"{collection_name}-{version}-{digest}", updated_at
 
-    for img_url in image_list:
-        if isinstance(img_url, str) and "cloudinary.com" in img_url:
+def is_not_modified(etag, updated_at, if_none_match, if_modified_since):
+    if if_none_match:
+        return if_none_match.contains(etag)
+    if if_modified_since and updated_at is not None:
+        return updated_at.replace(microsecond=0) <= if_modified_since
+    return False
+
+def conditional_get(collection_name, kind):
+    """
+    Adds ETag / Last-Modified / Cache-Control to a catalog GET route and
+    answers If-None-Match / If-Modified-Since with a 304 before the route
+    (and its Mongo query) runs.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
             try:
-                # Extract public_id: https://res.cloudinary.com/cloud_name/image/upload/v12345/folder/public_id.jpg
-                # This is a simplified extraction
-                parts = img_url.split('/')
-                filename = parts[-1].split('.')[0]
-                # Assuming images are in 'heavy_horizon' folder
-                public_id = f"heavy_horizon/{filename}"
-                cloudinary.uploader.destroy(public_id)
-                print(f"DEBUG: Deleted Cloudinary image {public_id}")
+                info = catalog_versions().get(collection_name, {})
             except Exception as e:
-                print(f"ERROR: Failed to delete Cloudinary image from URL {img_url}: {e}")
+                log.error("Failed to read catalog versions: %s", e)
+                return f(*args, **kwargs)
 
-# ---------------- MACHINES ----------------
-@app.route("/api/machines", methods=["GET"])
-def get_machines():
-    q = {}
-    if request.args.get("type"):
-        q["type"] = request.args.get("type")
-    if request.args.get("category"):
-        q["category"] = request.args.get("category")
+            variant = request.full_path + "|" + "|".join(str(v) for v in kwargs.values())
+            etag, updated_at = catalog_validators(collection_name, info, variant)
+
+            if is_not_modified(etag, updated_at, request.if_none_match, request.if_modified_since):
+                resp = app.response_class(status=304)
+            else:
+                resp = app.make_response(f(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+
+            resp.set_etag(etag)
+            if updated_at is not None:
+                resp.last_modified = updated_at
+            resp.headers["Cache-Control"] = CACHE_CONTROL[kind]
+            return resp
+        return wrapper
+    return decorator
+
+# ---------------- LISTING ----------------
+# Fields the list cards actually render. Image arrays are sliced to the first
+# entry and blog bodies are cut down to an excerpt.
+SUMMARY_PROJECTIONS = {
+    "machines": {
+        "title": 1, "category": 1, "type": 1, "machineCode": 1, "brand": 1,
+        "model": 1, "year": 1, "hours": 1, "location": 1, "price": 1,
+        "images": {"$slice": 1}
+    },
+    "parts": {
+        "name": 1, "compatibility": 1, "condition": 1, "price": 1,
+        "image": 1, "images": {"$slice": 1}
+    },
+    "blogs": {
+        # BlogCard / BlogDetail read created_at (and fall back to the _id time)
+        "title": 1, "featured_image": 1, "created_at": 1, "createdAt": 1,
+        "images": {"$slice": 1},
+        "content": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, 300]}
+    },
+}
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class ListQueryError(ValueError):
+    pass
+
+def parse_list_args(collection_name, args=None):
+    """
+    Reads the optional listing parameters shared by the public list routes:
+      limit  - page size; enables keyset pagination on _id
+      after  - _id of the last item of the previous page
+      order  - "asc" (default) or "desc"
+      view   - "summary" for the card projection
+      fields - comma separated top-level fields (overrides view)
+    args defaults to the current request's query string.
+    """
+    args = request.args if args is None else args
+    opts = {"limit": None, "after": None, "order": args.get("order", "asc"), "projection": None, "projection_key": None}
+
+    if opts["order"] not in ("asc", "desc"):
+        raise ListQueryError("order must be 'asc' or 'desc'")
+
+    if args.get("limit") is not None or args.get("after"):
+        try:
+            limit = int(args.get("limit", DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            raise ListQueryError("limit must be an integer")
+        opts["limit"] = max(1, min(limit, MAX_PAGE_LIMIT))
+
+    if args.get("after"):
+        try:
+            opts["after"] = ObjectId(args.get("after"))
+        except InvalidId:
+            raise ListQueryError("after must be a valid id")
+
+    if args.get("fields"):
+        fields = [f.strip() for f in args.get("fields").split(",") if f.strip()]
+        bad = [f for f in fields if not FIELD_NAME_RE.match(f)]
+        if bad:
+            raise ListQueryError(f"Invalid field names: {', '.join(bad)}")
+        opts["projection"] = {f: 1 for f in fields}
+        opts["projection_key"] = tuple(sorted(fields))
+    elif args.get("view") == "summary":
+        opts["projection"] = SUMMARY_PROJECTIONS[collection_name]
+        opts["projection_key"] = "summary"
+    elif args.get("view") not in (None, "", "full"):
+        raise ListQueryError("view must be 'summary' or 'full'")
+
+    return opts
+
+def list_cache_key(collection_name, q, opts):
+    return (collection_name, "list", (
+        tuple(sorted(q.items())),
+        opts["limit"],
+        str(opts["after"]) if opts["after"] else None,
+        opts["order"],
+        opts["projection_key"]
+    ))
+
+def list_query(q, opts):
+    """
+    (filter, sort, limit) for a listing query. A page asks for one extra
+    document so list_result can tell whether there is a next page.
+    """
+    if opts["limit"] is None:
+        return q, ([("_id", -1)] if opts["order"] == "desc" else None), None
+    direction = -1 if opts["order"] == "desc" else 1
+    q = dict(q)
+    if opts["after"]:
+        q["_id"] = {"$lt" if direction == -1 else "$gt": opts["after"]}
+    return q, [("_id", direction)], opts["limit"] + 1
+
+def list_result(items, opts):
+    if opts["limit"] is None:
+        return items
+    next_cursor = None
+    if len(items) > opts["limit"]:
+        items = items[:opts["limit"]]
+        next_cursor = items[-1]["_id"]
+    return {"items": items, "nextCursor": next_cursor}
+
+def fetch_list(collection, q, opts):
+    """
+    Runs the listing query. Without a limit the whole (optionally projected)
+    result is returned as a plain list, as before. With a limit a page is
+    returned as {"items": [...], "nextCursor": <id or None>}.
+    """
+    q, sort, limit = list_query(q, opts)
+    cursor = collection.find(q, opts["projection"])
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list_result(list(cursor), opts)
+
+def list_response(collection, collection_name, q):
+    try:
+        opts = parse_list_args(collection_name)
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        data = []
-        for m in machines.find(q):
-            m["_id"] = str(m["_id"])
-            data.append(m)
+        data = catalog_cache.get_or_load(
+            list_cache_key(collection_name, q, opts),
+            lambda: fetch_list(collection, q, opts)
+        )
         return jsonify(data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ---------------- MACHINES ----------------
+def machine_filter(args):
+    q = {}
+    if args.get("type"):
+        q["type"] = args.get("type")
+    if args.get("category"):
+        q["category"] = args.get("category")
+    return q
+
+@app.route("/api/machines", methods=["GET"])
+@conditional_get("machines", "list")
+def get_machines():
+    return list_response(machines, "machines", machine_filter(request.args))
+
 @app.route("/api/machines/<id>", methods=["GET"])
+@conditional_get("machines", "detail")
 def get_machine(id):
+    def load():
+        return machines.find_one({"_id": ObjectId(id)})
+
     try:
-        machine = machines.find_one({"_id": ObjectId(id)})
+        machine = catalog_cache.get_or_load(("machines", "detail", id), load)
         if not machine:
             return jsonify({"error": "Machine not found"}), 404
-        machine["_id"] = str(machine["_id"])
         return jsonify(machine)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -149,40 +513,27 @@ def get_machine(id):
 def add_machine():
     try:
         data = request.json
-        print("Received add_machine request:", data)
-        
-        # Generate Machine Code
-        category = data.get("category", "")
-        prefix = ""
-        if category == "Backhoe Loader":
-            prefix = "BL"
-        elif category == "Excavator":
-            prefix = "EXE"
-        elif category == "Backhoe Loader with Breaker":
-            prefix = "BLB"
-        
-        if prefix:
-            # Find the highest existing code for this prefix
-            last_machine = machines.find_one(
-                {"machineCode": {"$regex": f"^{prefix}-"}},
-                sort=[("machineCode", -1)]
-            )
-            
-            next_num = 1
-            if last_machine and "machineCode" in last_machine:
-                try:
-                    last_code = last_machine["machineCode"]
-                    last_num = int(last_code.split("-")[1])
-                    next_num = last_num + 1
-                except (IndexError, ValueError):
-                    pass
-            
-            data["machineCode"] = f"{prefix}-{next_num:04d}"
-        
-        machines.insert_one(data)
+        data.pop("_id", None)
+
+        # Generate Machine Code from the per-prefix counter. A duplicate key
+        # means a code was taken outside the allocator, so reseed and retry.
+        for attempt in range(3):
+            code = next_machine_code(db, data.get("category", ""))
+            if code:
+                data["machineCode"] = code
+            try:
+                machines.insert_one(data)
+                break
+            except DuplicateKeyError:
+                data.pop("_id", None)
+                if attempt == 2:
+                    raise
+                ensure_code_setup(db, force=True)
+        catalog_changed("machines")
+        dashboard_stats.bump(db, machines=1)
         return jsonify({"message": "Machine added", "machineCode": data.get("machineCode")})
     except Exception as e:
-        print("Error adding machine:", e)
+        log.exception("Error adding machine: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/admin/machines/<id>", methods=["PUT", "DELETE"])
@@ -196,13 +547,6 @@ def update_delete_machine(id):
         if not existing_machine:
             return jsonify({"error": "Machine not found"}), 404
             
-        # Reconcile images (delete from Cloudinary if removed from list)
-        old_images = existing_machine.get("images", [])
-        new_images = data.get("images", [])
-        removed_images = [img for img in old_images if img not in new_images]
-        if removed_images:
-            delete_cloudinary_images(removed_images)
-            
         # Clean up the data object
         if "_id" in data:
             del data["_id"]
@@ -210,58 +554,132 @@ def update_delete_machine(id):
             del data["machineCode"]
             
         machines.update_one({"_id": ObjectId(id)}, {"$set": data})
+        catalog_changed("machines", id)
+
+        # Reconcile images (delete from Cloudinary if removed from list)
+        old_images = existing_machine.get("images", [])
+        new_images = data.get("images", [])
+        removed_images = [img for img in old_images if img not in new_images]
+        if removed_images:
+            delete_cloudinary_images(removed_images)
         
-        updated = machines.find_one({"_id": ObjectId(id)})
-        updated["_id"] = str(updated["_id"])
-        return jsonify(updated)
-    
-    # DELETE logic with Cloudinary cleanup
-    machine = machines.find_one({"_id": ObjectId(id)})
-    if machine:
-        delete_cloudinary_images(machine.get("images", []))
+        return jsonify(machines.find_one({"_id": ObjectId(id)}))
     
-    machines.delete_one({"_id": ObjectId(id)})
+    # DELETE logic with Cloudinary cleanup (queued once the document is gone)
+    machine = machines.find_one_and_delete({"_id": ObjectId(id)})
+    catalog_doc_deleted("machines", id, machine)
     return jsonify({"message": "Machine deleted"})
 
 # ---------------- PARTS ----------------
 @app.route("/api/parts", methods=["GET"])
+@conditional_get("parts", "list")
 def get_parts():
-    try:
-        return jsonify([{**p, "_id": str(p["_id"])} for p in parts.find()])
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return list_response(parts, "parts", {})
 
 @app.route("/admin/parts", methods=["POST"])
 @token_required
 def add_part():
     parts.insert_one(request.json)
+    catalog_changed("parts")
+    dashboard_stats.bump(db, parts=1)
     return jsonify({"message": "Part added"})
 
 @app.route("/admin/parts/<id>", methods=["DELETE"])
 @token_required
 def delete_part(id):
-    part = parts.find_one({"_id": ObjectId(id)})
-    if part:
-        delete_cloudinary_images(part.get("images", []))
-    
-    parts.delete_one({"_id": ObjectId(id)})
+    part = parts.find_one_and_delete({"_id": ObjectId(id)})
+    catalog_doc_deleted("parts", id, part)
     return jsonify({"message": "Part deleted"})
 
-# ---------------- BLOGS ----------------
-@app.route("/api/blogs", methods=["GET"])
-def get_blogs():
+# ---------------- SEARCH ----------------
+# Machines and parts are small enough to search in process. The index is
+# rebuilt when either collection's catalog version moves, so an admin write
+# (here or on another worker) shows up within CATALOG_VERSION_TTL.
+SEARCH_INDEX_MAX_AGE = float(os.getenv("SEARCH_INDEX_MAX_AGE", 300))
+
+def load_search_docs():
+    docs = {}
+    for name, collection in (("machines", machines), ("parts", parts)):
+        projection = {f: 1 for f in set(SEARCH_FIELDS[name]) | set(RESULT_FIELDS[name]) | {"purpose", "year", "price"}}
+        projection["images"] = {"$slice": 1}
+        docs[name] = list(collection.find({}, projection).sort("_id", 1))
+    return docs
+
+search_index = SearchIndexHolder(load_search_docs, max_age=SEARCH_INDEX_MAX_AGE)
+
+def search_filters():
+    """Parses the /api/search filter parameters; raises ListQueryError."""
+    args = request.args
+    filters = {
+        "kind": args.get("kind"),
+        "category": args.get("category"),
+        "type": args.get("type"),
+        "priceBand": args.get("price_band"),
+    }
+    if filters["kind"] not in (None, "", "machines", "parts"):
+        raise ListQueryError("kind must be 'machines' or 'parts'")
+    if filters["priceBand"] not in (None, "") and filters["priceBand"] not in [b[0] for b in PRICE_BANDS]:
+        raise ListQueryError(f"price_band must be one of: {', '.join(b[0] for b in PRICE_BANDS)}")
+    for param, key in (("year_min", "yearMin"), ("year_max", "yearMax"), ("year", None)):
+        value = args.get(param)
+        if value in (None, ""):
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            raise ListQueryError(f"{param} must be an integer")
+        if key:
+            filters[key] = value
+        else:
+            filters["yearMin"] = filters["yearMax"] = value
+    return filters
+
+@app.route("/api/search", methods=["GET"])
+def search_catalog():
+    """
+    GET /api/search?q=exc&kind=machines&category=Excavator&type=Sales
+                   &year_min=2015&price_band=10L-20L&limit=20&offset=0
+    Every query term must match (prefix matches allowed) in title/name,
+    brand, model or machineCode. Results are ranked by field weight and
+    come back with facet counts for kind, category, type, year and priceBand.
+    """
     try:
-        return jsonify([{**b, "_id": str(b["_id"])} for b in blogs.find()])
+        filters = search_filters()
+        limit = max(1, min(int(request.args.get("limit", DEFAULT_PAGE_LIMIT)), MAX_PAGE_LIMIT))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+
+    try:
+        versions = catalog_versions()
+        key = tuple(versions.get(name, {}).get("version", 0) for name in ("machines", "parts"))
+        result = search_index.get(key).search(request.args.get("q", ""), filters, limit, offset)
     except Exception as e:
+        log.exception("Search failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
+    resp = jsonify(result)
+    resp.headers["Cache-Control"] = CACHE_CONTROL["list"]
+    return resp
+
+# ---------------- BLOGS ----------------
+@app.route("/api/blogs", methods=["GET"])
+@conditional_get("blogs", "list")
+def get_blogs():
+    return list_response(blogs, "blogs", {})
+
 @app.route("/api/blogs/<id>", methods=["GET"])
+@conditional_get("blogs", "detail")
 def get_blog(id):
+    def load():
+        return blogs.find_one({"_id": ObjectId(id)})
+
     try:
-        blog = blogs.find_one({"_id": ObjectId(id)})
+        blog = catalog_cache.get_or_load(("blogs", "detail", id), load)
         if not blog:
             return jsonify({"error": "Blog not found"}), 404
-        blog["_id"] = str(blog["_id"])
         return jsonify(blog)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -270,67 +688,258 @@ def get_blog(id):
 @token_required
 def add_blog():
     blogs.insert_one(request.json)
+    catalog_changed("blogs")
+    dashboard_stats.bump(db, blogs=1)
     return jsonify({"message": "Blog added"})
 
 @app.route("/admin/blogs/<id>", methods=["DELETE"])
 @token_required
 def delete_blog(id):
-    blog = blogs.find_one({"_id": ObjectId(id)})
-    if blog:
-        # Collect all images including featured_image if different
-        images_to_delete = blog.get("images", [])
-        feat_img = blog.get("featured_image")
-        if feat_img and feat_img not in images_to_delete:
-            if isinstance(feat_img, dict):
-                images_to_delete.append(feat_img)
-            elif isinstance(feat_img, str):
-                images_to_delete.append(feat_img)
-                
-        delete_cloudinary_images(images_to_delete)
-        
-    blogs.delete_one({"_id": ObjectId(id)})
+    blog = blogs.find_one_and_delete({"_id": ObjectId(id)})
+    catalog_doc_deleted("blogs", id, blog)
     return jsonify({"message": "Blog deleted"})
 
 # ---------------- ENQUIRIES ----------------
+MOBILE_RE = re.compile(r"^\d{10}$")
+# India has no DST, so a fixed offset matches Asia/Kolkata
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+# Per-worker limits: a burst of ENQUIRY_RATE_BURST, then one every
+# ENQUIRY_RATE_SECONDS per client IP, and a tighter one per mobile number
+ip_limiter = TokenBucketLimiter(
+    capacity=int(os.getenv("ENQUIRY_RATE_BURST", 5)),
+    refill_per_sec=1 / float(os.getenv("ENQUIRY_RATE_SECONDS", 60))
+)
+mobile_limiter = TokenBucketLimiter(
+    capacity=int(os.getenv("ENQUIRY_MOBILE_BURST", 3)),
+    refill_per_sec=1 / float(os.getenv("ENQUIRY_MOBILE_RATE_SECONDS", 300))
+)
+# Identical resubmissions (double clicks, retries) within the window are dropped
+duplicate_enquiries = DuplicateFilter(window=float(os.getenv("ENQUIRY_DUPLICATE_WINDOW", 600)))
+DUPLICATE_FIELDS = ("name", "mobile", "message", "machine_id", "type")
+
+def enquiries_written(n):
+    dashboard_stats.bump(db, totalEnquiries=n, unreadEnquiries=n)
+
+# Started by init_services()
+enquiry_buffer = None
+if os.getenv("ENQUIRY_WRITE_BEHIND", "1") == "1":
+    enquiry_buffer = EnquiryBuffer(
+        enquiries,
+        spool_dir=os.getenv("ENQUIRY_SPOOL_DIR", os.path.join(base_dir, "spool")),
+        max_batch=int(os.getenv("ENQUIRY_BATCH_SIZE", 50)),
+        flush_interval=float(os.getenv("ENQUIRY_FLUSH_INTERVAL", 1)),
+        on_flush=enquiries_written
+    )
+
+def client_ip():
+    # Already resolved from trusted X-Forwarded-For hops by ProxyFix
+    return request.remote_addr or ""
+
 @app.route("/api/enquiries", methods=["POST"])
 def enquiry():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request body"}), 400
     
     # 1. Validation
-    name = data.get("name", "").strip()
-    mobile = data.get("mobile", "").strip()
+    name = str(data.get("name") or "").strip()
+    mobile = str(data.get("mobile") or "").strip()
     
     if not name or not mobile:
         return jsonify({"error": "Name and mobile are required"}), 400
         
-    if not re.match(r'^\d{10}$', mobile):
+    if not MOBILE_RE.match(mobile):
         return jsonify({"error": "Mobile number must be exactly 10 digits"}), 400
 
+    if not ip_limiter.allow(client_ip()) or not mobile_limiter.allow(mobile):
+        return jsonify({"error": "Too many enquiries, please try again later"}), 429
+
+    # Only accepted submissions are remembered, so a retry after a 429 is stored
+    fingerprint = DuplicateFilter.fingerprint(data, DUPLICATE_FIELDS)
+    if duplicate_enquiries.seen_recently(fingerprint):
+        return jsonify({"message": "Enquiry submitted successfully"})
+
+    # The _id is always ours (a client-chosen one could collide or break the spool)
+    data.pop("_id", None)
     # Store as ISO string with IST offset for clarity
-    import pytz
-    ist = pytz.timezone('Asia/Kolkata')
-    data["createdAt"] = datetime.now(ist).isoformat()
+    data["name"] = name
+    data["mobile"] = mobile
+    data["createdAt"] = datetime.now(IST).isoformat()
     data["is_viewed"] = False
     data["status"] = "new"
     
-    enquiries.insert_one(data)
+    if enquiry_buffer:
+        enquiry_buffer.add(data)
+    else:
+        enquiries.insert_one(data)
+        enquiries_written(1)
+    duplicate_enquiries.record(fingerprint)
     return jsonify({"message": "Enquiry submitted successfully"})
 
+ENQUIRY_SORT = [("createdAt", -1), ("_id", -1)]
+ENQUIRY_EXPORT_BATCH = int(os.getenv("ENQUIRY_EXPORT_BATCH", 500))
+ENQUIRY_CSV_FIELDS = [
+    "_id", "createdAt", "type", "name", "mobile", "email", "category",
+    "machine_code", "machine_name", "location", "message", "status", "is_viewed"
+]
+
+def enquiry_filter():
+    """
+    Builds the enquiry query from the optional filters:
+      status     - exact status ("new", ...)
+      is_viewed  - "true" or "false"
+      from, to   - ISO dates or timestamps, inclusive. createdAt is stored as
+                   an IST ISO string, so timestamps are converted to IST
+                   (naive ones are taken as IST) and bare dates are IST
+                   calendar days.
+    """
+    args = request.args
+    q = {}
+    if args.get("status"):
+        q["status"] = args.get("status")
+    if args.get("is_viewed") in ("true", "false"):
+        q["is_viewed"] = args.get("is_viewed") == "true"
+    elif args.get("is_viewed"):
+        raise ListQueryError("is_viewed must be 'true' or 'false'")
+
+    created = {}
+    for arg in ("from", "to"):
+        value = args.get(arg)
+        if not value:
+            continue
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ListQueryError(f"{arg} must be an ISO date")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=IST)
+        # Same offset as the stored strings, so they compare chronologically
+        stamp = parsed.astimezone(IST).isoformat()
+        if arg == "from":
+            created["$gte"] = stamp
+        elif len(value) > 10:
+            created["$lte"] = stamp
+        else:
+            # A bare date sorts before every timestamp of that day
+            created["$lt"] = (parsed + timedelta(days=1)).date().isoformat()
+    if created:
+        q["createdAt"] = created
+    return q
+
+def encode_enquiry_cursor(doc):
+    raw = json.dumps([doc.get("createdAt"), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_enquiry_cursor(value):
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(value.encode()))
+        return created_at, ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId):
+        raise ListQueryError("after is not a valid cursor")
+
+def enquiry_after_filter(created_at, doc_id):
+    """Keyset condition for "sorts after (created_at, doc_id)" in ENQUIRY_SORT order."""
+    if created_at is None:
+        # Enquiries without createdAt sort last and only tie-break on _id
+        return {"createdAt": None, "_id": {"$lt": doc_id}}
+    return {"$or": [
+        {"createdAt": {"$lt": created_at}},
+        {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        {"createdAt": None},
+    ]}
+
 @app.route("/admin/enquiries", methods=["GET"])
 @token_required
 def get_enquiries():
-    # Sort by createdAt desc, fallback to _id if createdAt missing
-    data = []
-    for e in enquiries.find().sort([("createdAt", -1), ("_id", -1)]):
-        e["_id"] = str(e["_id"])
-        data.append(e)
-    return jsonify(data)
+    """
+    Without limit/after the full (filtered) list is streamed as a JSON array.
+    With them a page is returned as {"items": [...], "nextCursor": ...}.
+    """
+    args = request.args
+    try:
+        q = enquiry_filter()
+        limit = None
+        if args.get("limit") is not None or args.get("after"):
+            try:
+                limit = max(1, min(int(args.get("limit", DEFAULT_PAGE_LIMIT)), MAX_PAGE_LIMIT))
+            except ValueError:
+                raise ListQueryError("limit must be an integer")
+        if args.get("after"):
+            q = {"$and": [q, enquiry_after_filter(*decode_enquiry_cursor(args.get("after")))]}
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if limit is None:
+        cursor = enquiries.find(q).sort(ENQUIRY_SORT).batch_size(ENQUIRY_EXPORT_BATCH)
+        return Response(stream_with_context(stream_array(cursor)), mimetype="application/json")
+
+    items = list(enquiries.find(q).sort(ENQUIRY_SORT).limit(limit + 1))
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_enquiry_cursor(items[-1])
+    return jsonify({"items": items, "nextCursor": next_cursor})
+
+# Spreadsheets treat cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_cell(value):
+    """Quotes public form text so Excel shows it instead of evaluating it."""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def csv_rows(cursor):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=ENQUIRY_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for doc in cursor:
+        writer.writerow({field: csv_cell(doc.get(field)) for field in ENQUIRY_CSV_FIELDS})
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()
+
+def ndjson_rows(cursor):
+    for doc in cursor:
+        yield json_provider.dumps(doc) + "\n"
+
+@app.route("/admin/enquiries/export", methods=["GET"])
+@token_required
+def export_enquiries():
+    """
+    Streams enquiries as CSV (default) or NDJSON (format=ndjson) straight from
+    the cursor, with the same filters as the listing. Memory use is bounded
+    by ENQUIRY_EXPORT_BATCH, not by the number of enquiries.
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+    try:
+        q = enquiry_filter()
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cursor = enquiries.find(q).sort(ENQUIRY_SORT).batch_size(ENQUIRY_EXPORT_BATCH)
+    if fmt == "csv":
+        rows, mimetype = csv_rows(cursor), "text/csv"
+    else:
+        rows, mimetype = ndjson_rows(cursor), "application/x-ndjson"
+    filename = f"enquiries-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @app.route("/admin/enquiries/mark-read", methods=["POST"])
 @token_required
 def mark_enquiries_read():
     try:
-        enquiries.update_many({"is_viewed": False}, {"$set": {"is_viewed": True}})
+        res = enquiries.update_many({"is_viewed": False}, {"$set": {"is_viewed": True}})
+        dashboard_stats.bump(db, unreadEnquiries=-res.modified_count)
         return jsonify({"message": "Enquiries marked as read"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -340,31 +949,51 @@ def mark_enquiries_read():
 @token_required
 def get_dashboard_counts():
     try:
-        # Get counts (defaults to 0 if None, though count_documents returns int)
-        m_count = machines.count_documents({})
-        p_count = parts.count_documents({})
-        b_count = blogs.count_documents({})
-        # Count only unviewed enquiries for the notification badge
-        unread_e_count = enquiries.count_documents({"is_viewed": False})
-        total_e_count = enquiries.count_documents({})
-        
-        print(f"DEBUG: Dashboard Counts - Machines: {m_count}, Parts: {p_count}, Blogs: {b_count}, Unread: {unread_e_count}, Total Enquiries: {total_e_count}")
-        
-        return jsonify({
-            "machines": m_count,
-            "parts": p_count,
-            "blogs": b_count,
-            "unreadEnquiries": unread_e_count,
-            "totalEnquiries": total_e_count
-        })
+        # Single read of the materialized counters kept up to date by the
+        # write routes (see dashboard_stats.py / verify_counts.py --repair)
+        return jsonify(dashboard_stats.read_counts(db))
     except Exception as e:
-        print(f"Error fetching dashboard counts: {e}")
+        log.error("Error fetching dashboard counts: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/admin/cache/stats", methods=["GET"])
+@token_required
+def get_cache_stats():
+    return jsonify(catalog_cache.stats())
+
+@app.route("/admin/auth/stats", methods=["GET"])
+@token_required
+def get_auth_stats():
+    return jsonify(auth.timings.snapshot())
+
+# ---------------- METRICS ----------------
+for collector in metrics.metrics_collectors(catalog_cache, auth.timings):
+    metrics.registry.add_collector(collector)
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format. Set METRICS_TOKEN to require it as a bearer token."""
+    expected = os.getenv("METRICS_TOKEN")
+    if expected:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, expected):
+            return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(413)
+def handle_too_large(e):
+    return jsonify({"error": "Request too large"}), 413
+
 # ---------------- SERVE FRONTEND ----------------
+assets = StaticAssets(static_folder)
+
 @app.route("/")
 def index():
-    return send_from_directory(app.static_folder, 'index.html')
+    return assets.index_response()
+
+@app.route("/<path:filename>", endpoint="static")
+def static_files(filename):
+    return assets.serve(filename)
 
 @app.errorhandler(404)
 @app.errorhandler(405)
@@ -373,7 +1002,7 @@ def handle_routing_errors(e):
     # serve the React app index.html
     path = request.path
     if request.method == 'GET' and '.' not in path.split('/')[-1]:
-        return send_from_directory(app.static_folder, 'index.html')
+        return assets.index_response()
     
     # 2. For API routes or actual missing files, return appropriate error
     if path.startswith('/api/') or path.startswith('/admin/'):
@@ -381,8 +1010,90 @@ def handle_routing_errors(e):
         
     return "Not Found", 404
 
+# ---------------- STARTUP ----------------
+# Importing this module only defines routes. Everything that talks to Mongo,
+# Cloudinary or the disk runs once per process in init_services(), either
+# from create_app() or lazily on the first request.
+_services_lock = threading.Lock()
+_services = {"started": False, "workers": {}}
+
+def ensure_indexes_in_background():
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        log.error("Index bootstrap failed: %s", e)
+
+def precompress_in_background():
+    try:
+        log.info("Wrote %d precompressed static variants", precompress(static_folder))
+    except OSError as e:
+        log.error("Could not precompress static assets: %s", e)
+
+def init_services():
+    if _services["started"]:
+        return
+    with _services_lock:
+        if _services["started"]:
+            return
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET")
+        )
+        workers = _services["workers"]
+        # Idempotent; set ENSURE_INDEXES=0 to leave index management to db_indexes.py
+        if os.getenv("ENSURE_INDEXES", "1") == "1":
+            workers["indexes"] = threading.Thread(target=ensure_indexes_in_background, name="ensure-indexes", daemon=True)
+            workers["indexes"].start()
+        if os.getenv("IMAGE_CLEANUP_WORKER", "1") == "1":
+            delete_resources = metrics.timed_cloudinary("delete_resources", cloudinary.api.delete_resources, per_request=False)
+            workers["image_cleanup"] = image_cleanup.start_worker(db, delete_resources)
+        if enquiry_buffer:
+            workers["enquiry_buffer"] = enquiry_buffer.start()
+        # Transitional: deployments that relied on the old import-time admin creation
+        if os.getenv("BOOTSTRAP_ADMIN_ON_START") == "1":
+            threading.Thread(target=bootstrap_admin, name="bootstrap-admin", daemon=True).start()
+        # The .gz/.br variants belong to the build (python static_assets.py).
+        # STATIC_PRECOMPRESS=1 builds missing ones in the background instead;
+        # brotli at quality 11 takes seconds, so never on the request path.
+        if os.getenv("STATIC_PRECOMPRESS", "0") == "1":
+            workers["precompress"] = threading.Thread(
+                target=precompress_in_background, name="precompress-static", daemon=True
+            )
+            workers["precompress"].start()
+        _services["started"] = True
+
+@app.before_request
+def start_services_on_first_request():
+    init_services()
+
+def create_app():
+    """App factory for servers: gunicorn 'app:create_app()'."""
+    init_services()
+    return app
+
+@app.route("/healthz", methods=["GET"])
+def liveness():
+    # Process is up and serving; never touches dependencies
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz", methods=["GET"])
+def readiness():
+    checks = {}
+    try:
+        mongo.ping(timeout=float(os.getenv("READINESS_TIMEOUT", 2)))
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {e}"
+    checks["cloudinary"] = "ok" if cloudinary.config().cloud_name else "error: not configured"
+    for name, thread in _services["workers"].items():
+        if name != "indexes":
+            checks[name] = "ok" if thread and thread.is_alive() else "error: not running"
+    ready = all(v == "ok" for v in checks.values())
+    return jsonify({"status": "ok" if ready else "unavailable", "checks": checks}), 200 if ready else 503
+
 # ---------------- RUN ----------------
 if __name__ == "__main__":
     # Disable reloader on Windows to prevent WinError 10038
     # Using port 5000 as requested
-    app.run(debug=True, port=int(os.getenv("PORT", 5000)), use_reloader=False)
+    create_app().run(debug=True, port=int(os.getenv("PORT", 5000)), use_reloader=False)
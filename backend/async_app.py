@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+from urllib.parse import parse_qsl
+import jwt
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import http_date, parse_date, parse_etags, parse_options_header, quote_etag
+import app as wsgi
+import auth
+import metrics
+import uploads
+from json_provider import dumps
+from mongo import LazyAsyncMongo
+
+# ASGI serving mode:
+#   uvicorn async_app:app --host 0.0.0.0 --port 5000 --workers 2
+# The public catalog reads and the admin upload/delete routes run on the
+# event loop with AsyncMongoClient, so a slow Mongo or Cloudinary call no
+# longer pins a worker. Every other route is passed to the Flask app on a
+# small thread pool and behaves exactly as under gunicorn.
+
+# One loop multiplexes all in-flight requests of a worker, so the pool size
+# (not the worker count) bounds concurrent Mongo operations. minPoolSize
+# keeps connections warm so bursts don't pay for TCP/TLS handshakes.
+async_mongo_options = {
+    "event_listeners": [wsgi.mongo_listener],
+    "maxPoolSize": int(os.getenv("ASYNC_MONGO_MAX_POOL_SIZE", 100)),
+    "minPoolSize": int(os.getenv("ASYNC_MONGO_MIN_POOL_SIZE", 10)),
+    "maxConnecting": int(os.getenv("ASYNC_MONGO_MAX_CONNECTING", 4)),
+    "maxIdleTimeMS": int(os.getenv("ASYNC_MONGO_MAX_IDLE_MS", 300000)),
+}
+if os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"):
+    async_mongo_options["serverSelectionTimeoutMS"] = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"))
+amongo = LazyAsyncMongo(db_name=wsgi.MONGO_DB_NAME, **async_mongo_options)
+
+log = logging.getLogger("heavyhorizon.asgi")
+
+# Threads for the routes still served by Flask
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 16))
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope.get("query_string", b"").decode("latin-1")
+        self.args = MultiDict(parse_qsl(self.query_string, keep_blank_values=True))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+
+    @property
+    def full_path(self):
+        # Same as werkzeug's, so ETags match the ones the Flask routes issue
+        return f"{self.path}?{self.query_string}"
+
+    async def spool_body(self, max_bytes):
+        """Reads the body into a temp file (on disk past 1 MB). Returns (file, size)."""
+        body = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        size = 0
+        while True:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                raise ConnectionError("Client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                body.close()
+                raise RequestTooLarge()
+            body.write(chunk)
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+        return body, size
+
+
+def json_response(data, status=200, headers=None):
+    return status, list(headers or []), dumps(data).encode()
+
+
+async def send_response(send, status, headers, body):
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+    headers.append((b"access-control-allow-origin", b"*"))
+    if status != 304:
+        headers.append((b"content-type", b"application/json"))
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def check_token(request):
+    """None for a valid bearer token, otherwise the same 401 token_required returns."""
+    token = request.headers.get("authorization")
+    if not token:
+        return json_response({"error": "Token missing"}, 401)
+    try:
+        token_val = token.split(" ")[1] if " " in token else token
+        auth.verify_token(token_val, wsgi.app.config["SECRET_KEY"])
+    except jwt.ExpiredSignatureError:
+        return json_response({"error": "Token expired"}, 401)
+    except jwt.InvalidTokenError as e:
+        log.debug("Rejected token: %s", e)
+        return json_response({"error": "Invalid token"}, 401)
+    return None
+
+
+# ---------------- CATALOG READS ----------------
+_versions_lock = asyncio.Lock()
+
+async def catalog_versions():
+    """Async counterpart of app.catalog_versions, sharing its per-worker state."""
+    doc = wsgi.cached_catalog_versions()
+    if doc is not None:
+        return doc
+    # One read per TTL even when many requests notice it expired together
+    async with _versions_lock:
+        doc = wsgi.cached_catalog_versions()
+        if doc is None:
+            meta = await amongo["catalog_meta"].find_one({"_id": wsgi.CATALOG_VERSIONS_ID})
+            doc = wsgi.store_catalog_versions(meta)
+    return doc
+
+async def conditional(request, collection_name, kind, handler, variant=""):
+    """app.conditional_get for the async routes."""
+    try:
+        info = (await catalog_versions()).get(collection_name, {})
+    except Exception as e:
+        log.error("Failed to read catalog versions: %s", e)
+        return await handler()
+
+    etag, updated_at = wsgi.catalog_validators(collection_name, info, request.full_path + "|" + variant)
+    if_none_match = parse_etags(request.headers.get("if-none-match"))
+    if_modified_since = parse_date(request.headers.get("if-modified-since"))
+
+    if wsgi.is_not_modified(etag, updated_at, if_none_match, if_modified_since):
+        status, headers, body = 304, [], b""
+    else:
+        status, headers, body = await handler()
+        if status != 200:
+            return status, headers, body
+
+    headers.append(("etag", quote_etag(etag)))
+    if updated_at is not None:
+        headers.append(("last-modified", http_date(updated_at)))
+    headers.append(("cache-control", wsgi.CACHE_CONTROL[kind]))
+    return status, headers, body
+
+async def list_route(request, collection_name, q):
+    try:
+        opts = wsgi.parse_list_args(collection_name, request.args)
+    except wsgi.ListQueryError as e:
+        return json_response({"error": str(e)}, 400)
+
+    key = wsgi.list_cache_key(collection_name, q, opts)
+    try:
+        data = wsgi.catalog_cache.get(key)
+        if data is None:
+            query, sort, limit = wsgi.list_query(q, opts)
+            cursor = amongo[collection_name].find(query, opts["projection"])
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            data = wsgi.list_result(await cursor.to_list(), opts)
+            wsgi.catalog_cache.set(key, data)
+        return json_response(data)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+async def detail_route(collection_name, id, not_found):
+    key = (collection_name, "detail", id)
+    try:
+        doc = wsgi.catalog_cache.get(key)
+        if doc is None:
+            doc = await amongo[collection_name].find_one({"_id": ObjectId(id)})
+            if doc is not None:
+                wsgi.catalog_cache.set(key, doc)
+        if not doc:
+            return json_response({"error": not_found}, 404)
+        return json_response(doc)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+async def get_machines(request):
+    q = wsgi.machine_filter(request.args)
+    return await conditional(request, "machines", "list", lambda: list_route(request, "machines", q))
+
+async def get_machine(request, id):
+    return await conditional(request, "machines", "detail", lambda: detail_route("machines", id, "Machine not found"), id)
+
+async def get_parts(request):
+    return await conditional(request, "parts", "list", lambda: list_route(request, "parts", {}))
+
+async def get_blogs(request):
+    return await conditional(request, "blogs", "list", lambda: list_route(request, "blogs", {}))
+
+async def get_blog(request, id):
+    return await conditional(request, "blogs", "detail", lambda: detail_route("blogs", id, "Blog not found"), id)
+
+
+# ---------------- ADMIN I/O ----------------
+async def upload_images(request):
+    denied = check_token(request)
+    if denied:
+        return denied
+
+    max_bytes = wsgi.app.config["MAX_CONTENT_LENGTH"]
+    too_large = json_response({"error": "Request too large"}, 413)
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        return too_large
+    try:
+        body, size = await request.spool_body(max_bytes)
+    except RequestTooLarge:
+        return too_large
+
+    try:
+        mimetype, options = parse_options_header(request.headers.get("content-type", ""))
+        parser = FormDataParser(max_content_length=max_bytes)
+        # Multipart parsing writes big files to disk, so keep it off the loop
+        _, _, files = await asyncio.to_thread(parser.parse, body, mimetype, size, options)
+        files = files.getlist("images")
+        try:
+            uploads.check_limits(files)
+        except uploads.UploadLimitError as e:
+            return json_response({"error": str(e)}, 400)
+
+        uploader = metrics.timed_cloudinary("upload", wsgi.app.config["IMAGE_UPLOADER"])
+        results = await uploads.upload_all_async(files, uploader)
+        data, status = wsgi.upload_response_body(results, request.args.get("detailed") in ("1", "true"))
+        return json_response(data, status)
+    finally:
+        body.close()
+
+async def delete_route(request, collection_name, id, message):
+    denied = check_token(request)
+    if denied:
+        return denied
+    try:
+        doc = await amongo[collection_name].find_one_and_delete({"_id": ObjectId(id)})
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+    # Version bump, dashboard counters and the image outbox reuse the sync helpers
+    await asyncio.to_thread(wsgi.catalog_doc_deleted, collection_name, id, doc)
+    return json_response({"message": message})
+
+async def delete_machine(request, id):
+    return await delete_route(request, "machines", id, "Machine deleted")
+
+async def delete_part(request, id):
+    return await delete_route(request, "parts", id, "Part deleted")
+
+async def delete_blog(request, id):
+    return await delete_route(request, "blogs", id, "Blog deleted")
+
+
+# (method, rule, handler); rules use Flask's syntax so metrics labels match
+ROUTES = [
+    ("GET", "/api/machines", get_machines),
+    ("GET", "/api/machines/<id>", get_machine),
+    ("GET", "/api/parts", get_parts),
+    ("GET", "/api/blogs", get_blogs),
+    ("GET", "/api/blogs/<id>", get_blog),
+    ("POST", "/admin/upload", upload_images),
+    ("DELETE", "/admin/machines/<id>", delete_machine),
+    ("DELETE", "/admin/parts/<id>", delete_part),
+    ("DELETE", "/admin/blogs/<id>", delete_blog),
+]
+
+
+def compile_rule(rule):
+    return re.compile("^" + re.sub(r"<\w+>", "([^/]+)", rule) + "$")
+
+
+class AsyncApp:
+    """
+    ASGI app: routes in ROUTES are served natively, everything else
+    (including OPTIONS preflights and HEAD) goes to the Flask app.
+    """
+
+    def __init__(self, flask_app, routes=ROUTES, wsgi_threads=WSGI_THREADS):
+        self.routes = [(method, rule, compile_rule(rule), handler) for method, rule, handler in routes]
+        self.fallback = WSGIMiddleware(flask_app, workers=wsgi_threads)
+
+    def match(self, method, path):
+        for route_method, rule, pattern, handler in self.routes:
+            if route_method == method:
+                m = pattern.match(path)
+                if m:
+                    return rule, handler, m.groups()
+        return None, None, ()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] == "http":
+            rule, handler, params = self.match(scope["method"], scope["path"])
+            if handler:
+                return await self.handle(scope, receive, send, rule, handler, params)
+        # Flask routes are timed by metrics.instrument_flask
+        return await self.fallback(scope, receive, send)
+
+    async def handle(self, scope, receive, send, rule, handler, params):
+        start = time.perf_counter()
+        stats = metrics.RequestStats()
+        metrics.current_stats.set(stats)  # this task's context only
+        request = Request(scope, receive)
+        try:
+            status, headers, body = await handler(request, *params)
+        except ConnectionError:
+            return
+        except Exception as e:
+            log.exception("%s %s failed: %s", scope["method"], scope["path"], e)
+            status, headers, body = json_response({"error": str(e)}, 500)
+        await send_response(send, status, headers, body)
+        metrics.record_request(scope["method"], rule, status, time.perf_counter() - start, len(body), stats, scope["path"])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.to_thread(wsgi.init_services)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await amongo.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = AsyncApp(wsgi.app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("async_app:app", host="0.0.0.0", port=int(os.getenv("PORT", 5000)),
+                workers=int(os.getenv("WEB_CONCURRENCY", 1)))
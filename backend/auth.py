@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import jwt
+
+
+class TimingStats:
+    """Thread-safe count / total / max timings per operation name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            s = self._stats.setdefault(name, {"count": 0, "totalMs": 0.0, "maxMs": 0.0})
+            ms = seconds * 1000
+            s["count"] += 1
+            s["totalMs"] += ms
+            s["maxMs"] = max(s["maxMs"], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**s, "avgMs": s["totalMs"] / s["count"] if s["count"] else 0.0}
+                for name, s in self._stats.items()
+            }
+
+
+timings = TimingStats()
+
+
+class TokenCache:
+    """
+    Bounded cache of already-verified JWTs, keyed by the SHA-256 of the
+    token and kept only until the token's exp. Signature checks are skipped
+    for tokens in the cache.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            exp, claims = entry
+            if exp <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return claims
+
+    def put(self, token, claims):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._data[self.key(token)] = (exp, claims)
+            self._data.move_to_end(self.key(token))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+# Checked for unknown accounts so they take as long as known ones (cost 12,
+# the bcrypt default used when admins are created)
+DUMMY_HASH = b"$2b$12$q/hzo/sC.fKKd.gefujZFefDKk9cU0uZHbkNWH5HznXkK2D6mZ/MG"
+
+token_cache = TokenCache(int(os.getenv("TOKEN_CACHE_SIZE", 1024)))
+
+
+def verify_token(token, secret):
+    """
+    Returns the token claims. Raises jwt.ExpiredSignatureError or
+    jwt.InvalidTokenError like jwt.decode.
+    """
+    start = time.perf_counter()
+    claims = token_cache.get(token)
+    if claims is not None:
+        timings.record("token_verify_cached", time.perf_counter() - start)
+        return claims
+    claims = jwt.decode(token, secret, algorithms=["HS256"])
+    token_cache.put(token, claims)
+    timings.record("token_verify", time.perf_counter() - start)
+    return claims
+
+
+class LoginBusy(Exception):
+    pass
+
+
+class LoginLocked(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Locked for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LoginGuard:
+    """
+    Runs bcrypt on a small dedicated pool and caps how many checks may be
+    queued, so a flood of login attempts is rejected instead of tying up
+    every request worker. After free_attempts failures an account is
+    locked out with exponential backoff (per process). The failure count is
+    forgotten after failure_window quiet seconds (default max_lockout),
+    counted from the last failure or the end of its lockout.
+    """
+
+    def __init__(self, workers=2, max_pending=8, free_attempts=5, base_lockout=30, max_lockout=900,
+                 failure_window=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.free_attempts = free_attempts
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.failure_window = max_lockout if failure_window is None else failure_window
+        self._failures = OrderedDict()  # email -> (count, locked_until, last_failure)
+        self._lock = threading.Lock()
+
+    def check_lockout(self, email):
+        with self._lock:
+            _, locked_until, _ = self._failures.get(email, (0, 0, 0))
+        remaining = locked_until - time.time()
+        if remaining > 0:
+            raise LoginLocked(remaining)
+
+    def _record(self, email, ok):
+        with self._lock:
+            if ok:
+                self._failures.pop(email, None)
+                return
+            now = time.time()
+            count, locked_until, last_failure = self._failures.pop(email, (0, 0, 0))
+            if now - max(last_failure, locked_until) > self.failure_window:
+                count = 0
+            count += 1
+            locked_until = 0
+            if count >= self.free_attempts:
+                delay = min(self.base_lockout * 2 ** (count - self.free_attempts), self.max_lockout)
+                locked_until = now + delay
+            self._failures[email] = (count, locked_until, now)
+            while len(self._failures) > 10000:
+                self._failures.popitem(last=False)
+
+    def check_password(self, email, password, hashed):
+        """
+        Returns True if password matches hashed (pass None for an unknown
+        account). Raises LoginLocked or LoginBusy without running bcrypt.
+        """
+        self.check_lockout(email)
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        start = time.perf_counter()
+        try:
+            target = hashed if hashed else DUMMY_HASH
+            ok = self._executor.submit(bcrypt.checkpw, password.encode(), target).result()
+            ok = ok and hashed is not None
+        finally:
+            self._slots.release()
+            timings.record("bcrypt", time.perf_counter() - start)
+        self._record(email, ok)
+        return ok
+
+
+def login_guard_from_env():
+    return LoginGuard(
+        workers=int(os.getenv("BCRYPT_WORKERS", 2)),
+        max_pending=int(os.getenv("BCRYPT_MAX_PENDING", 8)),
+        free_attempts=int(os.getenv("LOGIN_FREE_ATTEMPTS", 5)),
+        base_lockout=float(os.getenv("LOGIN_LOCKOUT_SECONDS", 30)),
+        max_lockout=float(os.getenv("LOGIN_MAX_LOCKOUT_SECONDS", 900)),
+        failure_window=float(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", os.getenv("LOGIN_MAX_LOCKOUT_SECONDS", 900))),
+    )
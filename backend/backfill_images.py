@@ -0,0 +1,68 @@
+import maintenance
+
+# Rewrites stored image references as plain URL strings, the shape the upload
+# route returns today. Older admin builds saved Cloudinary responses
+# ({url, secure_url, public_id}), upload previews ({blobUrl}) and even
+# "[object Object]"; frontend/src/lib/images.js has to cope with all of them.
+# Cloudinary cleanup still works afterwards because the public id can be
+# recovered from the URL (image_cleanup.public_id_from_url).
+
+# Single-image fields next to the images list, per collection
+SINGLE_FIELDS = {"machines": (), "parts": ("image",), "blogs": ("featured_image",)}
+
+
+def image_url(image):
+    """The URL an entry points at, or None if it points nowhere."""
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("secure_url") or image.get("blobUrl")
+    if not isinstance(image, str):
+        return None
+    image = image.strip()
+    # blob: URLs only ever existed in the uploading admin's browser tab
+    if not image or image == "[object Object]" or image.startswith("blob:"):
+        return None
+    return image
+
+
+def normalized_images(images):
+    if not images:
+        return []
+    if not isinstance(images, list):
+        images = [images]
+    return [url for url in map(image_url, images) if url]
+
+
+class ImageNormalization(maintenance.Migration):
+    def __init__(self, collection):
+        self.name = f"normalize_images_{collection}"
+        self.collection = collection
+        self.single_fields = SINGLE_FIELDS[collection]
+        self.projection = {"images": 1, **{field: 1 for field in self.single_fields}}
+
+    def plan(self, db, docs):
+        for doc in docs:
+            before, new_values, unset = {}, {}, []
+            images = normalized_images(doc.get("images"))
+            if "images" in doc and images != doc["images"]:
+                before["images"] = doc["images"]
+                new_values["images"] = images
+            for field in self.single_fields:
+                if field not in doc:
+                    continue
+                url = image_url(doc[field])
+                if url == doc[field]:
+                    continue
+                before[field] = doc[field]
+                if url:
+                    new_values[field] = url
+                else:
+                    unset.append(field)
+            if before:
+                yield maintenance.Change(doc["_id"], before, new_values, unset)
+
+
+MIGRATIONS = [ImageNormalization(name) for name in SINGLE_FIELDS]
+
+
+if __name__ == "__main__":
+    maintenance.main(MIGRATIONS, description="Normalize stored images to URL strings")
@@ -0,0 +1,152 @@
+"""
+Sync (gunicorn) vs async (uvicorn, async_app.py) serving at equal memory.
+
+Both servers run the real app against the MongoDB in MONGO_URI, which should
+be a scratch database with some catalog data. Each mode is first started
+with two workers to measure per-worker RSS; then as many workers as fit in
+--memory-mb are started and driven with the public catalog routes at every
+--concurrency level.
+
+    python benchmarks/async_vs_sync.py --memory-mb 512 --concurrency 16 64 256
+
+The catalog cache is disabled by default so every request reaches Mongo;
+pass --cache to measure the cached path instead. Output is JSON.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import RSSSampler, run_load, tree_rss, wait_until_up
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_command(mode, workers, port, threads):
+    if mode == "sync":
+        return [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--threads", str(threads),
+                "--bind", f"127.0.0.1:{port}", "app:create_app()"]
+    return [sys.executable, "-m", "uvicorn", "async_app:app", "--workers", str(workers),
+            "--host", "127.0.0.1", "--port", str(port), "--no-access-log"]
+
+
+def server_env(cache):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env["IMAGE_CLEANUP_WORKER"] = "0"
+    if not cache:
+        env["CATALOG_CACHE_TTL"] = "0"
+    return env
+
+
+class Server:
+    def __init__(self, mode, workers, port, threads, cache):
+        self.mode, self.workers, self.port = mode, workers, port
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.proc = subprocess.Popen(
+            server_command(mode, workers, port, threads), cwd=BACKEND_DIR, env=server_env(cache),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+
+    def __enter__(self):
+        try:
+            wait_until_up(self.base_url + "/healthz")
+        except RuntimeError:
+            self.__exit__()
+            raise
+        # Let every worker finish booting before memory is measured
+        deadline = time.monotonic() + 30
+        while len(tree_rss(self.proc.pid)) < self.expected_processes() and time.monotonic() < deadline:
+            time.sleep(0.2)
+        return self
+
+    def expected_processes(self):
+        # gunicorn always has a master; uvicorn only supervises when workers > 1
+        if self.mode == "sync" or self.workers > 1:
+            return self.workers + 1
+        return 1
+
+    def __exit__(self, *exc):
+        os.killpg(self.proc.pid, signal.SIGTERM)
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+
+
+def catalog_requests(base_url):
+    def first_id(path):
+        with urllib.request.urlopen(base_url + path + "?limit=1") as resp:
+            items = json.load(resp)["items"]
+        return items[0]["_id"] if items else "000000000000000000000000"
+
+    machine_id, blog_id = first_id("/api/machines"), first_id("/api/blogs")
+    return [
+        ("machines_list", "GET", "/api/machines?view=summary", None, None),
+        ("machines_page", "GET", "/api/machines?limit=20", None, None),
+        ("machine_detail", "GET", f"/api/machines/{machine_id}", None, None),
+        ("parts_list", "GET", "/api/parts?view=summary", None, None),
+        ("blogs_list", "GET", "/api/blogs?view=summary", None, None),
+        ("blog_detail", "GET", f"/api/blogs/{blog_id}", None, None),
+    ]
+
+
+def workers_for_budget(mode, budget_bytes, args):
+    """
+    Starts two loaded workers to measure per-worker RSS and the fixed
+    overhead (gunicorn master / uvicorn supervisor), then fits the budget.
+    """
+    with Server(mode, 2, args.port, args.threads, args.cache) as server:
+        run_load(server.base_url, catalog_requests(server.base_url), 8, 2, warmup=0.5)
+        rss = tree_rss(server.proc.pid)
+    workers = sorted(rss.values(), reverse=True)[:2]
+    per_worker = max(workers)
+    overhead = sum(rss.values()) - sum(workers)
+    return max(1, int((budget_bytes - overhead) // per_worker)), per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memory-mb", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per sync worker")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--cache", action="store_true", help="keep the catalog cache enabled")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    args = parser.parse_args()
+
+    if not os.getenv("MONGO_URI"):
+        parser.error("MONGO_URI must point at a scratch MongoDB with catalog data")
+
+    report = {"memoryBudgetMb": args.memory_mb, "cache": args.cache, "modes": {}}
+    for mode in args.modes:
+        workers, per_worker = workers_for_budget(mode, args.memory_mb * 1024 * 1024, args)
+        runs = []
+        with Server(mode, workers, args.port, args.threads, args.cache) as server:
+            requests = catalog_requests(server.base_url)
+            idle_rss = sum(tree_rss(server.proc.pid).values())
+            for concurrency in args.concurrency:
+                with RSSSampler(server.proc.pid) as sampler:
+                    result = run_load(server.base_url, requests, concurrency, args.duration)
+                result["peakRssMb"] = sampler.peak / 1024 / 1024
+                runs.append(result)
+        report["modes"][mode] = {
+            "workers": workers,
+            "threads": args.threads if mode == "sync" else None,
+            "perWorkerRssMb": per_worker / 1024 / 1024,
+            "idleRssMb": idle_rss / 1024 / 1024,
+            "runs": runs,
+        }
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Server entry points used by load_test.py. Same app, with Cloudinary stubbed:
+
+    gunicorn --pythonpath benchmarks 'bench_server:create_app()'
+    uvicorn --app-dir benchmarks --factory bench_server:create_asgi_app
+
+BENCH_IN_MEMORY=1 swaps MongoDB for an in-process mongomock database seeded
+with seed_data (gunicorn with a single worker only, as every process gets
+its own copy). BENCH_CLOUDINARY_LATENCY_MS sets the stub upload latency.
+"""
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def stub_uploader(latency):
+    def upload(file):
+        digest = hashlib.sha1(file.read()).hexdigest()[:16]
+        time.sleep(latency)
+        return {"secure_url": f"https://res.cloudinary.com/bench/image/upload/v1700000000/heavy_horizon/{digest}.jpg"}
+    return upload
+
+
+def configure(appmod):
+    appmod.app.config["IMAGE_UPLOADER"] = stub_uploader(float(os.getenv("BENCH_CLOUDINARY_LATENCY_MS", 150)) / 1000)
+
+
+def use_in_memory_mongo():
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("BENCH_IN_MEMORY=1 needs mongomock (pip install mongomock)")
+    import pymongo
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    return client
+
+
+def create_app():
+    in_memory = os.getenv("BENCH_IN_MEMORY") == "1"
+    if in_memory:
+        use_in_memory_mongo()
+    import app as appmod
+    import seed_data
+    if in_memory:
+        counts = {name: int(os.getenv(f"BENCH_{name.upper()}", n)) for name, n in seed_data.DEFAULT_COUNTS.items()}
+        seed_data.seed(appmod.db, seed=int(os.getenv("BENCH_SEED", 42)), counts=counts)
+    configure(appmod)
+    return appmod.create_app()
+
+
+def create_asgi_app():
+    import app as appmod
+    import async_app
+    configure(appmod)
+    return async_app.app
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: encoding a 10k-document machine catalog with the old
+handler path (copy each document to stringify _id, then Flask's default
+jsonify) versus BSONJSONProvider, with and without orjson.
+
+    python benchmarks/json_encoding.py [--docs 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json_provider
+from json_provider import BSONJSONProvider
+
+CATEGORIES = ["Backhoe Loader", "Excavator", "Backhoe Loader with Breaker"]
+
+
+def make_catalog(n, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(n):
+        category = rng.choice(CATEGORIES)
+        docs.append({
+            "_id": ObjectId(),
+            "title": f"{category} {rng.choice(['JCB', 'Hitachi', 'CAT', 'Tata'])} #{i}",
+            "category": category,
+            "type": rng.choice(["sales", "services"]),
+            "machineCode": f"X-{i:05d}",
+            "model": f"M{rng.randint(100, 999)}",
+            "year": rng.randint(2005, 2025),
+            "hours": rng.randint(0, 20000),
+            "price": rng.randint(500000, 5000000),
+            "location": rng.choice(["Chennai", "Madurai", "Coimbatore"]),
+            "description": "Well maintained machine. " * rng.randint(2, 20),
+            "images": [f"https://res.cloudinary.com/demo/image/upload/v1/heavy_horizon/{i}_{k}.jpg" for k in range(rng.randint(1, 6))],
+            "updatedAt": start + timedelta(minutes=i),
+        })
+    return docs
+
+
+def old_path(app, docs):
+    with app.app_context():
+        return jsonify([{**d, "_id": str(d["_id"])} for d in docs]).get_data()
+
+
+def new_path(app, docs):
+    with app.app_context():
+        return jsonify(docs).get_data()
+
+
+def streamed(docs):
+    return "".join(json_provider.stream_array(iter(docs)))
+
+
+def bench(label, fn, repeat, number=1):
+    times = timeit.repeat(fn, repeat=repeat, number=number)
+    best = min(times) / number
+    print(f"{label:40} best {best * 1000:8.1f} ms   median {sorted(times)[len(times) // 2] / number * 1000:8.1f} ms")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_catalog(args.docs)
+    old_app = Flask("old")
+    new_app = Flask("new")
+    new_app.json = BSONJSONProvider(new_app)
+
+    print(f"{args.docs} documents, orjson {'available' if json_provider.orjson else 'not installed'}")
+    print("-" * 30)
+    baseline = bench("current: copy + str(_id) + jsonify", lambda: old_path(old_app, docs), args.repeat)
+    provider = bench("BSONJSONProvider jsonify", lambda: new_path(new_app, docs), args.repeat)
+    bench("BSONJSONProvider, stdlib encoder", lambda: json_provider.stdlib_dumps(docs), args.repeat)
+    stream = bench("stream_array (chunked)", lambda: streamed(docs), args.repeat)
+    print("-" * 30)
+    print(f"provider speedup {baseline / provider:.2f}x, streaming speedup {baseline / stream:.2f}x")
@@ -0,0 +1,306 @@
+"""
+Reproducible load test for the whole API.
+
+Seeds a deterministic synthetic dataset (seed_data.py), starts the app with
+Cloudinary stubbed (bench_server.py), drives each route scenario at every
+--concurrency level and writes p50/p95/p99 latency, throughput, errors and
+peak server RSS as JSON.
+
+    # MongoDB on localhost, scratch database heavyhorizon_bench (dropped and reseeded)
+    python benchmarks/load_test.py run --mongo-uri mongodb://localhost:27017 -o before.json
+
+    # No MongoDB: in-process mongomock stand-in (one worker; absolute numbers
+    # are not production-like, but the same seed gives comparable runs)
+    python benchmarks/load_test.py run --in-memory -o before.json
+
+    python benchmarks/load_test.py compare before.json after.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+import jwt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+from loadgen import RSSSampler, run_load, tree_rss, wait_until_up
+import seed_data
+
+SECRET = "load-test-secret-not-for-production-use"
+SCENARIOS = [
+    "machines_list", "machines_page", "machines_filter", "machine_detail", "parts_list", "blogs_list",
+    "blog_detail", "search", "enquiry_submit", "dashboard_counts", "admin_enquiries_page",
+    "admin_enquiries_export", "upload",
+]
+# Scenarios mongomock can't serve, skipped with --in-memory
+IN_MEMORY_UNSUPPORTED = {
+    "blogs_list": "mongomock does not support the $substrCP summary projection",
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def server_env(args):
+    env = dict(os.environ)
+    env.update({
+        "SECRET_KEY": SECRET,
+        "MONGO_DB_NAME": args.db_name,
+        "BENCH_CLOUDINARY_LATENCY_MS": str(args.cloudinary_latency_ms),
+        "BENCH_SEED": str(args.seed),
+        "IMAGE_CLEANUP_WORKER": "0",
+        # Every request comes from 127.0.0.1, so the public limits would turn
+        # the enquiry scenario into a 429 benchmark
+        "ENQUIRY_RATE_BURST": "1000000000",
+        "ENQUIRY_RATE_SECONDS": "0.000001",
+        "ENQUIRY_MOBILE_BURST": "1000000000",
+        "ENQUIRY_MOBILE_RATE_SECONDS": "0.000001",
+    })
+    for name in seed_data.DEFAULT_COUNTS:
+        env[f"BENCH_{name.upper()}"] = str(getattr(args, name))
+    if args.in_memory:
+        env["BENCH_IN_MEMORY"] = "1"
+    else:
+        env["MONGO_URI"] = args.mongo_uri
+    return env
+
+
+def server_command(args):
+    if args.server == "async":
+        return [sys.executable, "-m", "uvicorn", "--app-dir", BENCH_DIR, "--factory", "bench_server:create_asgi_app",
+                "--workers", str(args.workers), "--host", "127.0.0.1", "--port", str(args.port), "--no-access-log"]
+    return [sys.executable, "-m", "gunicorn", "--pythonpath", BENCH_DIR, "--workers", str(args.workers),
+            "--threads", str(args.threads), "--bind", f"127.0.0.1:{args.port}", "--timeout", "120",
+            "bench_server:create_app()"]
+
+
+def multipart_body(files):
+    boundary = "----loadtest" + "0" * 16
+    parts = []
+    for name, data in files:
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"images\"; filename=\"{name}\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def build_scenarios(data, args):
+    token = jwt.encode(
+        {"email": "loadtest@example.com", "exp": datetime.now(timezone.utc) + timedelta(hours=12)},
+        SECRET, algorithm="HS256"
+    )
+    auth = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(args.seed)
+    machine_ids = [str(m["_id"]) for m in rng.sample(data["machines"], min(50, len(data["machines"])))]
+    blog_ids = [str(b["_id"]) for b in data["blogs"][:20]]
+    terms = ["exc", "jcb 3dx", "backhoe", "hitachi ex200", "komatsu", "EXE-00", "pump", "bucket"]
+
+    mobiles = itertools.count(7000000000)
+
+    def enquiry_body():
+        mobile = str(next(mobiles))
+        body = json.dumps({
+            "type": "Sales", "name": "Load Test", "mobile": mobile, "email": "lt@example.com",
+            "category": "Excavator", "machine_code": "EXE-0001", "location": "Chennai",
+            "message": "Looking for a machine for a three month project",
+        })
+        return body.encode(), {"Content-Type": "application/json"}
+
+    images = [(f"img{i}.jpg", b"\xff\xd8\xff\xe0" + rng.randbytes(args.upload_kb * 1024)) for i in range(3)]
+    upload_body, upload_type = multipart_body(images)
+
+    return {
+        "machines_list": [("machines_list", "GET", "/api/machines?view=summary", None, None)],
+        "machines_page": [("machines_page", "GET", "/api/machines?limit=20&order=desc", None, None)],
+        "machines_filter": [("machines_filter", "GET", "/api/machines?type=Sales&category=Excavator", None, None)],
+        "machine_detail": [("machine_detail", "GET", f"/api/machines/{i}", None, None) for i in machine_ids],
+        "parts_list": [("parts_list", "GET", "/api/parts?view=summary", None, None)],
+        "blogs_list": [("blogs_list", "GET", "/api/blogs?view=summary", None, None)],
+        "blog_detail": [("blog_detail", "GET", f"/api/blogs/{i}", None, None) for i in blog_ids],
+        "search": [("search", "GET", f"/api/search?q={t.replace(' ', '+')}&limit=20", None, None) for t in terms],
+        "enquiry_submit": [("enquiry_submit", "POST", "/api/enquiries", None, enquiry_body)],
+        "dashboard_counts": [("dashboard_counts", "GET", "/admin/dashboard/counts", auth, None)],
+        "admin_enquiries_page": [("admin_enquiries_page", "GET", "/admin/enquiries?limit=50", auth, None)],
+        "admin_enquiries_export": [("admin_enquiries_export", "GET", "/admin/enquiries/export?format=csv", auth, None)],
+        "upload": [("upload", "POST", "/admin/upload", {**auth, "Content-Type": upload_type}, upload_body)],
+    }
+
+
+class Server:
+    def __init__(self, args):
+        self.proc = subprocess.Popen(
+            server_command(args), cwd=BACKEND_DIR, env=server_env(args),
+            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL, start_new_session=True
+        )
+        self.base_url = f"http://127.0.0.1:{args.port}"
+
+    def __enter__(self):
+        try:
+            # The in-memory mode seeds inside the worker before it listens
+            wait_until_up(self.base_url + "/healthz", timeout=300)
+        except RuntimeError:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        os.killpg(self.proc.pid, signal.SIGTERM)
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+
+
+def seed_mongo(args):
+    import pymongo
+    if args.db_name == "heavyhorizon" and not args.force:
+        raise SystemExit("Refusing to reseed the production database name; use --db-name or --force")
+    client = pymongo.MongoClient(args.mongo_uri)
+    try:
+        counts = {name: getattr(args, name) for name in seed_data.DEFAULT_COUNTS}
+        seed_data.seed(client[args.db_name], seed=args.seed, counts=counts)
+    finally:
+        client.close()
+
+
+def run(args):
+    if args.in_memory:
+        if args.server == "async" or args.workers != 1:
+            raise SystemExit("--in-memory runs a single sync worker (mongomock is per process)")
+    elif not args.mongo_uri:
+        raise SystemExit("Pass --mongo-uri or --in-memory")
+    else:
+        seed_mongo(args)
+
+    data = seed_data.generate(args.seed, {name: getattr(args, name) for name in seed_data.DEFAULT_COUNTS})
+    scenarios = build_scenarios(data, args)
+    selected = args.scenarios or SCENARIOS
+    skipped = {}
+    if args.in_memory:
+        skipped = {name: IN_MEMORY_UNSUPPORTED[name] for name in selected if name in IN_MEMORY_UNSUPPORTED}
+        selected = [name for name in selected if name not in skipped]
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "backend": "in-memory" if args.in_memory else "mongodb",
+            "server": args.server, "workers": args.workers, "threads": args.threads,
+            "seed": args.seed, "duration": args.duration, "concurrency": args.concurrency,
+            "cloudinaryLatencyMs": args.cloudinary_latency_ms, "uploadKb": args.upload_kb,
+            **{name: getattr(args, name) for name in seed_data.DEFAULT_COUNTS},
+        },
+        "scenarios": {},
+        "skipped": skipped,
+    }
+    failed = []
+    with Server(args) as server:
+        report["idleRssMb"] = sum(tree_rss(server.proc.pid).values()) / 1024 / 1024
+        peak = 0
+        for name in selected:
+            runs = []
+            for concurrency in args.concurrency:
+                with RSSSampler(server.proc.pid) as sampler:
+                    result = run_load(server.base_url, scenarios[name], concurrency, args.duration, warmup=args.warmup)
+                result.pop("routes", None)
+                result["peakRssMb"] = sampler.peak / 1024 / 1024
+                peak = max(peak, sampler.peak)
+                runs.append(result)
+                if result["errorRate"] > args.max_error_rate:
+                    failed.append(f"{name} c={concurrency}: {result['errors']}/{result['requests']} errors")
+                if args.verbose:
+                    print(f"{name} c={concurrency}: {result['throughputRps']:.1f} rps, p95 {result['p95Ms']} ms", file=sys.stderr)
+            report["scenarios"][name] = runs
+        report["peakRssMb"] = peak / 1024 / 1024
+
+    out = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    print(out)
+    if failed:
+        # Latencies exclude errors, but a scenario that mostly failed measured nothing useful
+        raise SystemExit("Scenarios over --max-error-rate:\n  " + "\n  ".join(failed))
+
+
+def compare(args):
+    """Relative change per scenario and concurrency, new vs base (negative latency change is better)."""
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    def change(old, cur):
+        if old in (None, 0) or cur is None:
+            return None
+        return round((cur - old) / old * 100, 1)
+
+    diff = {"base": base.get("commit"), "new": new.get("commit"), "peakRssMbChangePct": change(base.get("peakRssMb"), new.get("peakRssMb")), "scenarios": {}}
+    for name, runs in new["scenarios"].items():
+        old_runs = {r["concurrency"]: r for r in base["scenarios"].get(name, [])}
+        rows = []
+        for r in runs:
+            old = old_runs.get(r["concurrency"])
+            if not old:
+                continue
+            rows.append({
+                "concurrency": r["concurrency"],
+                **{f"{key}ChangePct": change(old[key], r[key]) for key in ("throughputRps", "p50Ms", "p95Ms", "p99Ms")},
+                "errors": [old["errors"], r["errors"]],
+            })
+        diff["scenarios"][name] = rows
+    print(json.dumps(diff, indent=2, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="seed, start the server and run the scenarios")
+    p.add_argument("--mongo-uri")
+    p.add_argument("--in-memory", action="store_true", help="use mongomock inside the server process")
+    p.add_argument("--db-name", default="heavyhorizon_bench")
+    p.add_argument("--force", action="store_true")
+    p.add_argument("--server", choices=["sync", "async"], default="sync")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    p.add_argument("--port", type=int, default=5098)
+    p.add_argument("--seed", type=int, default=42)
+    for name, n in seed_data.DEFAULT_COUNTS.items():
+        p.add_argument(f"--{name}", type=int, default=n)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    p.add_argument("--duration", type=float, default=5)
+    p.add_argument("--warmup", type=float, default=1)
+    p.add_argument("--cloudinary-latency-ms", type=float, default=150)
+    p.add_argument("--upload-kb", type=int, default=200)
+    p.add_argument("--scenarios", nargs="+", choices=SCENARIOS)
+    p.add_argument("--max-error-rate", type=float, default=0.5,
+                   help="exit non-zero if any scenario has a larger share of non-2xx responses")
+    p.add_argument("-o", "--output")
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=run)
+
+    p = sub.add_parser("compare", help="compare two run outputs")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Small closed-loop HTTP load generator and process memory helpers shared by
+the benchmark scripts. Standard library only: each of `concurrency` threads
+keeps one HTTP/1.1 connection open and sends requests back to back.
+"""
+import http.client
+import itertools
+import os
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def latency_summary(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "p50Ms": percentile(values, 50),
+        "p95Ms": percentile(values, 95),
+        "p99Ms": percentile(values, 99),
+        "maxMs": values[-1] if values else None,
+    }
+
+
+def process_rss(pid):
+    """Resident set size of one process in bytes (Linux /proc)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def child_pids(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except FileNotFoundError:
+        pass
+    return children
+
+
+def tree_rss(pid):
+    """{pid: rss bytes} for a process and all its descendants."""
+    result = {}
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            result[p] = process_rss(p)
+        except FileNotFoundError:
+            continue
+        stack.extend(child_pids(p))
+    return result
+
+
+class RSSSampler:
+    """Samples the RSS of a process tree in the background and keeps the peak."""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, sum(tree_rss(self.pid).values()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if resp.status < 500:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def run_load(base_url, requests, concurrency, duration, warmup=1.0):
+    """
+    requests: list of (name, method, path, headers, body) cycled through by
+    every worker. body may be a callable returning (body, extra headers) so
+    each request can differ (e.g. unique enquiries).
+    Returns overall and per-name throughput / latency percentiles. Only 2xx
+    responses count toward latency and throughput; anything else (including
+    connection failures) is counted in errors.
+    """
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    results = {}
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def worker(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        local = {}
+        for name, method, path, headers, body in itertools.islice(itertools.cycle(requests), offset, None):
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            hdrs = dict(headers or {})
+            if callable(body):
+                body, extra = body()
+                hdrs.update(extra)
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                payload = resp.read()
+                ok = 200 <= resp.status < 300
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                payload, ok = b"", False
+            elapsed = (time.perf_counter() - t0) * 1000
+            if now < start_at:
+                continue  # warm-up requests aren't counted
+            stats = local.setdefault(name, {"latencies": [], "errors": 0, "bytes": 0})
+            stats["bytes"] += len(payload)
+            if ok:
+                stats["latencies"].append(elapsed)
+            else:
+                stats["errors"] += 1
+        conn.close()
+        with lock:
+            for name, stats in local.items():
+                merged = results.setdefault(name, {"latencies": [], "errors": 0, "bytes": 0})
+                merged["latencies"].extend(stats["latencies"])
+                merged["errors"] += stats["errors"]
+                merged["bytes"] += stats["bytes"]
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    def summarize(stats):
+        total = len(stats["latencies"]) + stats["errors"]
+        return {
+            "requests": total,
+            "errors": stats["errors"],
+            "errorRate": stats["errors"] / total if total else 0.0,
+            "throughputRps": len(stats["latencies"]) / duration,
+            "bytes": stats["bytes"],
+            **latency_summary(stats["latencies"]),
+        }
+
+    everything = {"latencies": [], "errors": 0, "bytes": 0}
+    for stats in results.values():
+        everything["latencies"].extend(stats["latencies"])
+        everything["errors"] += stats["errors"]
+        everything["bytes"] += stats["bytes"]
+    return {
+        "concurrency": concurrency,
+        "durationS": duration,
+        **summarize(everything),
+        "routes": {name: summarize(stats) for name, stats in sorted(results.items())},
+    }
@@ -0,0 +1,150 @@
+"""
+Deterministic synthetic catalog for benchmarks: machines, parts, blogs and
+enquiries shaped like the ones the admin UI creates (including the mixed
+string / {url, public_id} image entries). The same --seed always produces
+the same documents and _ids, so runs on different commits are comparable.
+"""
+import os
+import random
+import struct
+import sys
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dashboard_stats
+from machine_codes import PREFIX_MAP, ensure_code_setup, format_code
+
+DEFAULT_COUNTS = {"machines": 500, "parts": 800, "blogs": 60, "enquiries": 20000}
+
+BRANDS = {
+    "Backhoe Loader": [("JCB", ["3DX", "3DX Plus", "4DX"]), ("CAT", ["424", "432"]), ("Mahindra", ["EarthMaster SX"]), ("Case", ["770EX", "851FX"])],
+    "Excavator": [("Tata Hitachi", ["EX70", "EX200", "Zaxis 220"]), ("Komatsu", ["PC71", "PC210"]), ("Hyundai", ["R215", "HX220"]), ("Volvo", ["EC210D"])],
+    "Backhoe Loader with Breaker": [("JCB", ["3DX Xtra", "3DX Super"]), ("CAT", ["424B2"])],
+}
+LOCATIONS = ["Chennai", "Coimbatore", "Madurai", "Bengaluru", "Hyderabad", "Pune", "Trichy", "Salem", "Vellore", "Kochi"]
+CONDITIONS = ["Excellent", "Good", "Fair", "Refurbished"]
+PART_NAMES = ["Bucket tooth", "Hydraulic pump", "Boom cylinder seal kit", "Track roller", "Fuel filter", "Swing motor",
+              "Bucket pin", "Control valve", "Radiator", "Starter motor", "Idler wheel", "Air filter"]
+WORDS = ("machine site work hydraulic engine service loader excavator bucket operator hours maintenance "
+         "condition project rental quarry road construction fuel parts inspection delivery").split()
+
+ENQUIRY_START = datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+
+
+class IdFactory:
+    """ObjectIds with increasing timestamps and seeded random tails."""
+
+    def __init__(self, rng, start=1735689600):
+        self.rng = rng
+        self.ts = start
+
+    def __call__(self):
+        self.ts += 1
+        return ObjectId(struct.pack(">I", self.ts) + self.rng.randbytes(8))
+
+
+def image_entry(rng, folder="heavy_horizon"):
+    public_id = f"{folder}/{rng.randbytes(6).hex()}"
+    url = f"https://res.cloudinary.com/bench/image/upload/v1700000000/{public_id}.jpg"
+    # The admin UI has stored both shapes over time
+    return url if rng.random() < 0.7 else {"url": url, "public_id": public_id}
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def generate(seed=42, counts=None):
+    """Returns {collection: [documents]} for the given seed."""
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    rng = random.Random(seed)
+    new_id = IdFactory(rng)
+    data = {"machines": [], "parts": [], "blogs": [], "enquiries": []}
+
+    code_numbers = {prefix: 0 for prefix in PREFIX_MAP.values()}
+    for _ in range(counts["machines"]):
+        category = rng.choice(list(BRANDS))
+        brand, models = rng.choice(BRANDS[category])
+        model = rng.choice(models)
+        prefix = PREFIX_MAP[category]
+        code_numbers[prefix] += 1
+        purpose = rng.choice(["Sales", "Rental"])
+        machine = {
+            "_id": new_id(),
+            "title": f"{brand} {model} {category}",
+            "category": category,
+            "type": purpose,
+            "brand": brand,
+            "model": model,
+            "year": rng.randint(2008, 2024),
+            "hours": rng.randint(500, 15000),
+            "condition": rng.choice(CONDITIONS),
+            "location": rng.choice(LOCATIONS),
+            "status": rng.choice(["Available", "Available", "Sold"]),
+            "machineCode": format_code(prefix, code_numbers[prefix]),
+            "images": [image_entry(rng) for _ in range(rng.randint(3, 8))],
+        }
+        if purpose == "Sales":
+            machine["price"] = rng.randrange(300000, 6000000, 5000)
+        data["machines"].append(machine)
+
+    for _ in range(counts["parts"]):
+        brand, models = rng.choice(rng.choice(list(BRANDS.values())))
+        data["parts"].append({
+            "_id": new_id(),
+            "name": f"{rng.choice(PART_NAMES)} - {brand}",
+            "compatibility": ", ".join(rng.sample(models, k=min(len(models), rng.randint(1, 2)))),
+            "condition": rng.choice(["New", "Used", "Refurbished"]),
+            "price": rng.randrange(1500, 250000, 500),
+            "image": image_entry(rng),
+            "images": [image_entry(rng) for _ in range(rng.randint(0, 3))],
+        })
+
+    for i in range(counts["blogs"]):
+        images = [image_entry(rng) for _ in range(rng.randint(1, 4))]
+        data["blogs"].append({
+            "_id": new_id(),
+            "title": sentence(rng, rng.randint(4, 9)),
+            "content": " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(20, 60))),
+            "images": images,
+            "featured_image": images[0],
+            "createdAt": (ENQUIRY_START + timedelta(days=i * 5)).isoformat(),
+        })
+
+    machines = data["machines"]
+    for i in range(counts["enquiries"]):
+        machine = rng.choice(machines) if machines and rng.random() < 0.7 else None
+        created = ENQUIRY_START + timedelta(seconds=i * 31536000 // max(counts["enquiries"], 1) + rng.randint(0, 600))
+        data["enquiries"].append({
+            "_id": new_id(),
+            "type": machine["type"] if machine else rng.choice(["Sales", "Rental", "Parts"]),
+            "name": f"Customer {i}",
+            "mobile": f"9{rng.randint(0, 999999999):09d}",
+            "email": f"customer{i}@example.com",
+            "category": machine["category"] if machine else "",
+            "machine_code": machine["machineCode"] if machine else "",
+            "machine_name": machine["title"] if machine else "",
+            "location": rng.choice(LOCATIONS),
+            "message": sentence(rng, rng.randint(5, 25)),
+            "createdAt": created.isoformat(),
+            "is_viewed": rng.random() < 0.8,
+            "status": rng.choice(["new", "contacted", "closed"]),
+        })
+    return data
+
+
+def seed(db, seed=42, counts=None, drop=True):
+    """Writes generate(seed, counts) into db and rebuilds derived state. Returns the data."""
+    data = generate(seed, counts)
+    for name, docs in data.items():
+        if drop:
+            db[name].delete_many({})
+        for i in range(0, len(docs), 1000):
+            db[name].insert_many(docs[i:i + 1000], ordered=False)
+    if drop:
+        for name in ("counters", dashboard_stats.STATS_COLLECTION, "catalog_meta", "image_deletions"):
+            db[name].delete_many({})
+    ensure_code_setup(db, force=True)
+    dashboard_stats.write_counts(db, dashboard_stats.compute_counts(db))
+    return data
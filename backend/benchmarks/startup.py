@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark: times `import app`, create_app() and the first
+/healthz request in fresh interpreters, against an unreachable MongoDB so
+any import-time network work shows up as a stall.
+
+    python benchmarks/startup.py [--runs 10] [--importtime]
+
+--importtime also prints the slowest modules from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+resp = app.app.test_client().get("/healthz")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "status": resp.status_code,
+    "mongo_connected": app.mongo.connected,
+}))
+"""
+
+
+def probe_env():
+    env = dict(os.environ)
+    env.update({
+        # Nothing listens here; a client that connects at import would stall
+        "MONGO_URI": "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=2000",
+        "SECRET_KEY": env.get("SECRET_KEY", "benchmark"),
+    })
+    return env
+
+
+def run_once(env):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top=15):
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [p.strip() for p in line.split("|")]
+        rows.append((int(cumulative_us), int(self_us.split(":")[-1]), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    env = probe_env()
+    runs = [run_once(env) for _ in range(args.runs)]
+    summary = {"runs": args.runs}
+    for key in ("import_ms", "create_app_ms", "first_request_ms"):
+        values = [r[key] for r in runs]
+        summary[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    summary["mongo_connected_after_healthz"] = any(r["mongo_connected"] for r in runs)
+    print(json.dumps(summary, indent=2))
+
+    if args.importtime:
+        print("-" * 30)
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative, self_us, name in slowest_imports(env):
+            print(f"{cumulative / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """
+    Small in-process TTL + LRU cache for the public catalog reads.
+
+    Keys are (collection, kind, params) tuples, e.g.
+    ("machines", "list", (("category", "Excavator"),)) or ("blogs", "detail", "<id>").
+    Each gunicorn worker keeps its own copy, so the TTL bounds how stale a
+    worker can be after another worker handled the admin write.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, collection, doc_id=None):
+        """
+        Drop every list entry for a collection, plus the detail entry for
+        doc_id when given. Detail entries for other documents are kept.
+        """
+        with self._lock:
+            stale = [
+                k for k in self._data
+                if k[0] == collection and (k[1] == "list" or (doc_id is not None and k[2] == str(doc_id)))
+            ]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+
+    def invalidate_collection(self, collection):
+        """Drop every entry (lists and details) for a collection."""
+        with self._lock:
+            stale = [k for k in self._data if k[0] == collection]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "maxEntries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def cache_from_env():
+    return CatalogCache(
+        max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 256)),
+        ttl=float(os.getenv("CATALOG_CACHE_TTL", 300)),
+    )
@@ -0,0 +1,195 @@
+import bisect
+import re
+import threading
+import time
+from collections import defaultdict
+
+# Field weights per collection. machineCode is matched both as a whole
+# ("exe0012") and by its parts ("exe", "0012").
+SEARCH_FIELDS = {
+    "machines": {"machineCode": 4.0, "title": 3.0, "brand": 2.0, "model": 2.0, "category": 1.0, "location": 0.5},
+    "parts": {"name": 3.0, "brand": 2.0, "model": 2.0, "compatibility": 1.5, "category": 1.0},
+}
+
+# What the result cards need; the full document is one detail call away
+RESULT_FIELDS = {
+    "machines": ["title", "category", "type", "purpose", "machineCode", "brand", "model", "year", "hours", "location", "price", "images"],
+    "parts": ["name", "compatibility", "condition", "price", "image", "images", "category"],
+}
+
+# (label, min inclusive, max exclusive), INR
+PRICE_BANDS = [
+    ("under-5L", 0, 500000),
+    ("5L-10L", 500000, 1000000),
+    ("10L-20L", 1000000, 2000000),
+    ("20L-50L", 2000000, 5000000),
+    ("50L-plus", 5000000, float("inf")),
+]
+
+PREFIX_MATCH_FACTOR = 0.5
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower()) if text is not None else []
+
+
+def field_tokens(field, value):
+    tokens = tokenize(value)
+    if field == "machineCode" and len(tokens) > 1:
+        tokens.append("".join(tokens))
+    return tokens
+
+
+def parse_price(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        digits = re.sub(r"[^\d.]", "", value)
+        try:
+            return float(digits) if digits else None
+        except ValueError:
+            return None
+    return None
+
+
+def price_band(value):
+    price = parse_price(value)
+    if price is None:
+        return None
+    for label, low, high in PRICE_BANDS:
+        if low <= price < high:
+            return label
+    return None
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over machines and parts. Each token maps to
+    {doc position: weight}; a sorted vocabulary gives prefix lookups via
+    bisect, so "exc" finds "excavator" without scanning every token.
+    """
+
+    def __init__(self, docs_by_kind):
+        self.docs = []
+        self.facets = []
+        self.postings = defaultdict(dict)
+        for kind, docs in docs_by_kind.items():
+            weights = SEARCH_FIELDS[kind]
+            for doc in docs:
+                pos = len(self.docs)
+                result = {f: doc[f] for f in RESULT_FIELDS[kind] if f in doc}
+                if isinstance(result.get("images"), list):
+                    result["images"] = result["images"][:1]
+                result["_id"] = doc["_id"]
+                result["kind"] = kind
+                self.docs.append(result)
+                year = doc.get("year")
+                self.facets.append({
+                    "kind": kind,
+                    "category": doc.get("category") or None,
+                    "type": doc.get("type") or doc.get("purpose") or None,
+                    "year": year if isinstance(year, int) else None,
+                    "priceBand": price_band(doc.get("price")),
+                })
+                for field, weight in weights.items():
+                    for token in field_tokens(field, doc.get(field)):
+                        postings = self.postings[token]
+                        postings[pos] = max(postings.get(pos, 0), weight)
+        self.vocab = sorted(self.postings)
+
+    def term_scores(self, term):
+        """{doc position: score} for one query term, exact matches ranking above prefix matches."""
+        scores = {}
+        i = bisect.bisect_left(self.vocab, term)
+        while i < len(self.vocab) and self.vocab[i].startswith(term):
+            token = self.vocab[i]
+            factor = 1.0 if token == term else PREFIX_MATCH_FACTOR
+            for pos, weight in self.postings[token].items():
+                score = weight * factor
+                if score > scores.get(pos, 0):
+                    scores[pos] = score
+            i += 1
+        return scores
+
+    def match(self, query):
+        """All documents matching every query term, as {position: score}."""
+        terms = tokenize(query)
+        if not terms:
+            return {pos: 0.0 for pos in range(len(self.docs))}
+        matched = None
+        for term in terms:
+            scores = self.term_scores(term)
+            if matched is None:
+                matched = scores
+            else:
+                matched = {pos: matched[pos] + s for pos, s in scores.items() if pos in matched}
+            if not matched:
+                return {}
+        return matched
+
+    def search(self, query="", filters=None, limit=20, offset=0):
+        """
+        filters: {"kind", "category", "type", "priceBand": exact values,
+                  "yearMin", "yearMax": ints}
+        Facet counts for each dimension ignore that dimension's own filter,
+        so the UI can show the alternatives to the current selection.
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+        matched = self.match(query)
+
+        def passes(pos, skip=None):
+            f = self.facets[pos]
+            for key in ("kind", "category", "type", "priceBand"):
+                if key != skip and key in filters and f[key] != filters[key]:
+                    return False
+            if skip != "year":
+                if "yearMin" in filters and (f["year"] is None or f["year"] < filters["yearMin"]):
+                    return False
+                if "yearMax" in filters and (f["year"] is None or f["year"] > filters["yearMax"]):
+                    return False
+            return True
+
+        hits = [pos for pos in matched if passes(pos)]
+        # Highest score first; ties keep catalog order for stable paging
+        hits.sort(key=lambda pos: (-matched[pos], pos))
+
+        facets = {}
+        for dim in ("kind", "category", "type", "year", "priceBand"):
+            counts = defaultdict(int)
+            for pos in matched:
+                value = self.facets[pos][dim]
+                if value is not None and passes(pos, skip=dim):
+                    counts[value] += 1
+            facets[dim] = sorted(
+                ({"value": v, "count": c} for v, c in counts.items()),
+                key=lambda item: (-item["count"], str(item["value"]))
+            )
+
+        items = [{**self.docs[pos], "score": round(matched[pos], 3)} for pos in hits[offset:offset + limit]]
+        return {"total": len(hits), "items": items, "facets": facets, "limit": limit, "offset": offset}
+
+
+class SearchIndexHolder:
+    """
+    Keeps the current SearchIndex and rebuilds it when the catalog version
+    key changes (or after max_age seconds, to pick up direct DB edits).
+    """
+
+    def __init__(self, loader, max_age=300):
+        self.loader = loader
+        self.max_age = max_age
+        self._index = None
+        self._key = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, version_key):
+        if self._index is not None and self._key == version_key and time.monotonic() - self._built_at < self.max_age:
+            return self._index
+        with self._lock:
+            if self._index is None or self._key != version_key or time.monotonic() - self._built_at >= self.max_age:
+                self._index = SearchIndex(self.loader())
+                self._key = version_key
+                self._built_at = time.monotonic()
+            return self._index
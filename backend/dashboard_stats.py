@@ -0,0 +1,63 @@
+from pymongo import ReturnDocument
+
+# Materialized dashboard counters, kept in one document that the write
+# routes update with $inc. verify_counts.py --repair fixes any drift.
+STATS_COLLECTION = "stats"
+STATS_ID = "dashboard_counts"
+COUNTER_FIELDS = ("machines", "parts", "blogs", "unreadEnquiries", "totalEnquiries")
+
+
+def compute_counts(db):
+    """Counts straight from the collections (the slow path)."""
+    return {
+        "machines": db["machines"].count_documents({}),
+        "parts": db["parts"].count_documents({}),
+        "blogs": db["blogs"].count_documents({}),
+        "unreadEnquiries": db["enquiries"].count_documents({"is_viewed": False}),
+        "totalEnquiries": db["enquiries"].count_documents({}),
+    }
+
+
+def bump(db, **deltas):
+    """
+    Atomically adjusts counters, e.g. bump(db, machines=1). Never creates the
+    document: counting up from zero on an existing database would be wrong,
+    so until read_counts() has computed it the bump is simply dropped.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    db[STATS_COLLECTION].update_one({"_id": STATS_ID}, {"$inc": deltas})
+
+
+def write_counts(db, counts):
+    return db[STATS_COLLECTION].find_one_and_update(
+        {"_id": STATS_ID},
+        {"$set": counts},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def read_counts(db):
+    """
+    Returns the stored counters. The first call against a database without a
+    stats document computes and stores them.
+    """
+    doc = db[STATS_COLLECTION].find_one({"_id": STATS_ID})
+    if not doc or any(f not in doc for f in COUNTER_FIELDS):
+        doc = write_counts(db, compute_counts(db))
+    return {f: max(int(doc.get(f, 0)), 0) for f in COUNTER_FIELDS}
+
+
+def reconcile(db, repair=False):
+    """
+    Compares stored counters with real counts. Returns {field: (stored, actual)}
+    for every field that drifted, and overwrites the stored values if repair.
+    """
+    doc = db[STATS_COLLECTION].find_one({"_id": STATS_ID}) or {}
+    actual = compute_counts(db)
+    drift = {f: (doc.get(f), actual[f]) for f in COUNTER_FIELDS if doc.get(f) != actual[f]}
+    if repair and drift:
+        write_counts(db, actual)
+    return drift
@@ -0,0 +1,130 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+from machine_codes import ensure_code_index
+
+log = logging.getLogger("heavyhorizon.db_indexes")
+
+# collection -> list of (keys, options). The unique machineCode index is
+# owned by machine_codes.py and created through ensure_code_index().
+INDEXES = {
+    "machines": [
+        # get_machines filters on type, category or both
+        ([("type", ASCENDING), ("category", ASCENDING)], {"name": "type_category"}),
+        ([("category", ASCENDING)], {"name": "category"}),
+    ],
+    "enquiries": [
+        # get_enquiries sort order
+        ([("createdAt", DESCENDING), ("_id", DESCENDING)], {"name": "createdAt_id"}),
+        # Unread badge count
+        ([("is_viewed", ASCENDING)], {"name": "is_viewed"}),
+    ],
+    "admins": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+}
+
+
+def ensure_indexes(db, verbose=False):
+    """
+    Creates every declared index. create_index is a no-op for an index that
+    already exists with the same spec, so this is safe to run on every start.
+    """
+    for collection_name, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                name = db[collection_name].create_index(keys, **options)
+                if verbose:
+                    print(f"OK    {collection_name}.{name}")
+            except PyMongoError as e:
+                log.error("Could not create index %s on %s: %s", options.get("name"), collection_name, e)
+    ensure_code_index(db)
+    if verbose:
+        print("OK    machines.machineCode_unique")
+
+
+def route_queries():
+    """
+    The queries the routes in app.py run, as (label, collection, filter, sort,
+    allow_collscan). Unfiltered full listings are expected to scan.
+    """
+    sample_id = ObjectId()
+    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    return [
+        ("GET /api/machines", "machines", {}, None, True),
+        ("GET /api/machines?type", "machines", {"type": "sales"}, None, False),
+        ("GET /api/machines?category", "machines", {"category": "Excavator"}, None, False),
+        ("GET /api/machines?type&category", "machines", {"type": "sales", "category": "Excavator"}, None, False),
+        ("GET /api/machines?limit", "machines", {"_id": {"$gt": sample_id}}, [("_id", ASCENDING)], False),
+        ("GET /api/machines/<id>", "machines", {"_id": sample_id}, None, False),
+        ("POST /admin/machines (code seed)", "machines", {"machineCode": {"$type": "string", "$regex": "^EXE-"}}, None, False),
+        ("GET /api/parts", "parts", {}, None, True),
+        ("GET /api/blogs", "blogs", {}, None, True),
+        ("GET /api/blogs/<id>", "blogs", {"_id": sample_id}, None, False),
+        ("GET /admin/enquiries", "enquiries", {}, [("createdAt", DESCENDING), ("_id", DESCENDING)], False),
+        ("GET /admin/enquiries (since)", "enquiries", {"createdAt": {"$gte": week_ago}}, [("createdAt", DESCENDING), ("_id", DESCENDING)], False),
+        ("GET /admin/dashboard/counts (unread)", "enquiries", {"is_viewed": False}, None, False),
+        ("POST /admin/login", "admins", {"email": "admin@example.com"}, None, False),
+    ]
+
+
+def plan_stages(plan):
+    """Yields every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+def explain_queries(db):
+    """Runs explain() on each route query. Returns the labels that COLLSCAN unexpectedly."""
+    problems = []
+    for label, collection_name, q, sort, allow_collscan in route_queries():
+        cursor = db[collection_name].find(q)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        except PyMongoError as e:
+            print(f"ERROR {label}: {e}")
+            problems.append(label)
+            continue
+        stages = list(plan_stages(plan))
+        flag = "OK"
+        if "COLLSCAN" in stages:
+            flag = "SCAN" if allow_collscan else "FAIL"
+            if not allow_collscan:
+                problems.append(label)
+        print(f"{flag:5} {label:40} {' <- '.join(stages)}")
+    return problems
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check route query plans")
+    parser.add_argument("--explain", action="store_true", help="also explain() each route query and fail on unexpected COLLSCANs")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client[os.getenv("MONGO_DB_NAME", "heavyhorizon")]
+
+    ensure_indexes(db, verbose=True)
+    if args.explain:
+        print("-" * 30)
+        problems = explain_queries(db)
+        print("-" * 30)
+        if problems:
+            print(f"{len(problems)} route(s) fall back to a collection scan")
+            sys.exit(1)
+        print("All route queries are index-backed")
@@ -0,0 +1,228 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+log = logging.getLogger("heavyhorizon.enquiry_ingest")
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets (e.g. per IP, per mobile). Each key holds up to
+    capacity tokens and regains refill_per_sec; a request spends one. Only
+    the max_keys most recently seen keys are tracked.
+    """
+
+    def __init__(self, capacity, refill_per_sec, max_keys=10000):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_sec)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class DuplicateFilter:
+    """Remembers submission fingerprints for window seconds."""
+
+    def __init__(self, window, max_keys=10000):
+        self.window = window
+        self.max_keys = max_keys
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(data, fields):
+        raw = json.dumps([str(data.get(f, "")).strip().lower() for f in fields])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def seen_recently(self, key):
+        """True if key was recorded within the window."""
+        with self._lock:
+            last = self._seen.get(key)
+            return last is not None and time.monotonic() - last < self.window
+
+    def record(self, key):
+        """Call once a submission has been accepted."""
+        with self._lock:
+            self._seen.pop(key, None)
+            self._seen[key] = time.monotonic()
+            while len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+
+
+class EnquiryBuffer:
+    """
+    Write-behind buffer for enquiries. add() queues a document; a background
+    thread flushes with insert_many when max_batch documents are waiting or
+    every flush_interval seconds. A batch that can't be written is saved to
+    an NDJSON spool file in spool_dir and replayed by the next successful
+    flush of any worker, so a Mongo outage doesn't lose submissions.
+
+    on_flush(n) is called with the number of documents inserted.
+    """
+
+    SPOOL_PREFIX = "enquiries-"
+    REJECTED_PREFIX = "rejected-"
+
+    def __init__(self, collection, spool_dir, max_batch=50, flush_interval=1.0, on_flush=None):
+        self.collection = collection
+        self.spool_dir = spool_dir
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="enquiry-buffer", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add(self, doc):
+        # _id is assigned here so a batch replayed from the spool can't be
+        # inserted twice; never one from the client
+        doc["_id"] = ObjectId()
+        with self._lock:
+            self._pending.append(doc)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("Enquiry flush failed: %s", e)
+
+    def flush(self):
+        with self._flush_lock:
+            # Spool first: the pending batch is only taken once nothing else can fail
+            spooled, claimed = self._claim_spool()
+            with self._lock:
+                batch, self._pending = self._pending, []
+            batch = spooled + batch
+            if not batch:
+                return 0
+            try:
+                inserted = self._insert(batch)
+            except PyMongoError as e:
+                log.error("Could not write %d enquiries, spooling to disk: %s", len(batch), e)
+                try:
+                    self._write_spool(batch)
+                except OSError as spool_error:
+                    # Keep everything in memory (and the claimed files) for the next flush
+                    log.error("Could not spool enquiries: %s", spool_error)
+                    with self._lock:
+                        self._pending = batch + self._pending
+                    return 0
+                self._remove(claimed)
+                return 0
+            self._remove(claimed)
+            if self.on_flush and inserted:
+                self.on_flush(inserted)
+            return inserted
+
+    def _insert(self, batch):
+        try:
+            return len(self.collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Duplicate _ids come from a spool replay that already landed
+            other = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+            if other:
+                raise
+            return e.details.get("nInserted", 0)
+
+    def _claim_spool(self):
+        """
+        Takes over every spool file by renaming it first; rename is atomic,
+        so two workers never replay the same file from the same name.
+        """
+        docs, claimed = [], []
+        if not os.path.isdir(self.spool_dir):
+            return docs, claimed
+        for name in os.listdir(self.spool_dir):
+            if not name.startswith(self.SPOOL_PREFIX) or name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            # Files left claimed by a dead worker are taken over under their original name
+            base = name.split(".ndjson", 1)[0]
+            target = os.path.join(self.spool_dir, f"{base}.ndjson.{os.getpid()}.claimed")
+            try:
+                os.rename(path, target)
+                with open(target, encoding="utf-8") as f:
+                    lines = [line for line in f if line.strip()]
+            except OSError:
+                continue
+            bad = []
+            for line in lines:
+                try:
+                    doc = json.loads(line)
+                    doc["_id"] = ObjectId(doc["_id"])
+                except (ValueError, TypeError, KeyError, InvalidId):
+                    bad.append(line)
+                    continue
+                docs.append(doc)
+            if bad:
+                self._reject(base, bad)
+            claimed.append(target)
+        return docs, claimed
+
+    def _reject(self, base, lines):
+        """Moves unreadable spool lines aside so they can't block later flushes."""
+        path = os.path.join(self.spool_dir, f"{self.REJECTED_PREFIX}{base}-{time.time_ns()}.ndjson")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+            log.error("Moved %d unreadable spooled enquiries to %s", len(lines), path)
+        except OSError as e:
+            log.error("Dropped %d unreadable spooled enquiries: %s", len(lines), e)
+
+    def _write_spool(self, batch):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{self.SPOOL_PREFIX}{os.getpid()}-{time.time_ns()}.ndjson")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in batch:
+                f.write(json.dumps({**doc, "_id": str(doc["_id"])}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
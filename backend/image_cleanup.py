@@ -0,0 +1,202 @@
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+
+log = logging.getLogger("heavyhorizon.image_cleanup")
+
+# Durable outbox of Cloudinary images to delete. Admin routes only insert
+# here; a background worker drains it in batches with retries.
+OUTBOX_COLLECTION = "image_deletions"
+BATCH_SIZE = min(int(os.getenv("IMAGE_CLEANUP_BATCH", 100)), 100)  # Admin API limit
+MAX_ATTEMPTS = int(os.getenv("IMAGE_CLEANUP_MAX_ATTEMPTS", 8))
+POLL_INTERVAL = float(os.getenv("IMAGE_CLEANUP_POLL_INTERVAL", 5))
+LEASE_SECONDS = 300
+BASE_BACKOFF = 30
+
+# Path segments between /upload/ and the public id: transformations
+# ("c_fill,w_400", "f_auto") and the version ("v1712345678")
+_VERSION_RE = re.compile(r"^v\d+$")
+# Cloudinary transformation parameter keys. Without a version segment, only
+# segments made entirely of these are dropped, so a folder such as
+# "my_folder" stays part of the public id.
+_TRANSFORM_KEYS = {
+    "a", "ac", "af", "ar", "b", "bo", "br", "c", "co", "cs", "d", "dl", "dn", "dpr", "du", "e", "eo",
+    "f", "fl", "fn", "fps", "g", "h", "if", "ki", "l", "o", "p", "pg", "q", "r", "so", "sp", "t",
+    "u", "vc", "vs", "w", "x", "y", "z",
+}
+
+
+def is_transformation(segment):
+    """True for "c_fill,w_400", "f_auto", "$width_100", ... but not "my_folder"."""
+    for component in segment.split(","):
+        key, sep, _ = component.partition("_")
+        if not sep or not (key in _TRANSFORM_KEYS or key.startswith("$")):
+            return False
+    return True
+
+
+def public_id_from_url(url):
+    """
+    https://res.cloudinary.com/<cloud>/image/upload/[transforms/][v123/]heavy_horizon/sub/name.jpg
+    -> "heavy_horizon/sub/name". Returns None for non-Cloudinary URLs.
+    """
+    if not isinstance(url, str) or "res.cloudinary.com" not in url or "/upload/" not in url:
+        return None
+    path = url.split("?", 1)[0].split("/upload/", 1)[1]
+    segments = [s for s in path.split("/") if s]
+    for i, segment in enumerate(segments[:-1]):
+        if _VERSION_RE.match(segment):
+            segments = segments[i + 1:]
+            break
+    else:
+        while len(segments) > 1 and is_transformation(segments[0]):
+            segments = segments[1:]
+    if not segments:
+        return None
+    segments[-1] = segments[-1].rsplit(".", 1)[0]
+    return "/".join(segments)
+
+
+def public_id_from_image(image):
+    """Accepts a URL string or a dict such as the raw Cloudinary upload response."""
+    if isinstance(image, dict):
+        if isinstance(image.get("public_id"), str) and image["public_id"]:
+            return image["public_id"]
+        return public_id_from_url(image.get("secure_url") or image.get("url"))
+    return public_id_from_url(image)
+
+
+def enqueue(db, images):
+    """
+    Records images for deletion. Keyed by public_id, so queueing the same
+    image twice is a no-op.
+    """
+    if not images:
+        return 0
+    if not isinstance(images, list):
+        images = [images]
+    now = datetime.now(timezone.utc)
+    ops = []
+    for public_id in {public_id_from_image(img) for img in images} - {None}:
+        ops.append(UpdateOne(
+            {"_id": public_id},
+            {"$setOnInsert": {
+                "status": "pending", "attempts": 0,
+                "next_attempt_at": now, "created_at": now
+            }},
+            upsert=True
+        ))
+    if ops:
+        db[OUTBOX_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def claim_batch(db, limit=BATCH_SIZE):
+    """
+    Leases up to limit due entries to this caller. The lease expires, so an
+    entry claimed by a worker that died is picked up again later.
+    """
+    outbox = db[OUTBOX_COLLECTION]
+    now = datetime.now(timezone.utc)
+    due = {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": now}}
+    ids = [d["_id"] for d in outbox.find(due, {"_id": 1}).limit(limit)]
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    outbox.update_many(
+        {"_id": {"$in": ids}, **due},
+        {"$set": {"status": "processing", "claim": token, "next_attempt_at": now + timedelta(seconds=LEASE_SECONDS)}}
+    )
+    return [d["_id"] for d in outbox.find({"claim": token}, {"_id": 1})]
+
+
+def process_batch(db, delete_fn, limit=BATCH_SIZE):
+    """
+    Deletes one claimed batch with a single delete_fn(public_ids) call
+    (cloudinary.api.delete_resources). "deleted" and "not_found" both
+    complete an entry; anything else is retried with exponential backoff
+    until MAX_ATTEMPTS. Returns the number of entries claimed.
+    """
+    outbox = db[OUTBOX_COLLECTION]
+    public_ids = claim_batch(db, limit)
+    if not public_ids:
+        return 0
+
+    try:
+        deleted = (delete_fn(public_ids) or {}).get("deleted", {})
+    except Exception as e:
+        log.error("Cloudinary bulk delete failed: %s", e)
+        deleted = {}
+        error = str(e)
+    else:
+        error = "not deleted"
+
+    done = [pid for pid in public_ids if deleted.get(pid) in ("deleted", "not_found")]
+    if done:
+        outbox.delete_many({"_id": {"$in": done}})
+
+    failed = [pid for pid in public_ids if pid not in done]
+    previous = {d["_id"]: d.get("attempts", 0) for d in outbox.find({"_id": {"$in": failed}}, {"attempts": 1})}
+    now = datetime.now(timezone.utc)
+    retry_ops = []
+    for pid in failed:
+        attempts = previous.get(pid, 0) + 1
+        retry_ops.append(UpdateOne({"_id": pid}, {
+            "$set": {
+                "status": "failed" if attempts >= MAX_ATTEMPTS else "pending",
+                "attempts": attempts,
+                "last_error": deleted.get(pid, error),
+                "next_attempt_at": now + timedelta(seconds=BASE_BACKOFF * 2 ** (attempts - 1))
+            },
+            "$unset": {"claim": ""}
+        }))
+    if retry_ops:
+        outbox.bulk_write(retry_ops, ordered=False)
+    return len(public_ids)
+
+
+def drain(db, delete_fn):
+    """Processes batches until nothing is due. Returns the number of entries handled."""
+    total = 0
+    while True:
+        n = process_batch(db, delete_fn)
+        if not n:
+            return total
+        total += n
+
+
+def start_worker(db, delete_fn, interval=POLL_INTERVAL):
+    """Starts a daemon thread that drains the outbox every interval seconds."""
+    def run():
+        while True:
+            try:
+                drain(db, delete_fn)
+            except Exception as e:
+                log.error("Image cleanup worker: %s", e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="image-cleanup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # One-shot drain, e.g. from cron when the in-app worker is disabled
+    from pymongo import MongoClient
+    from dotenv import load_dotenv
+    import cloudinary
+    import cloudinary.api
+
+    load_dotenv()
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET")
+    )
+    db = MongoClient(os.getenv("MONGO_URI"))[os.getenv("MONGO_DB_NAME", "heavyhorizon")]
+    print(f"Processed {drain(db, cloudinary.api.delete_resources)} queued image deletions")
@@ -0,0 +1,83 @@
+import datetime
+import decimal
+import json
+import uuid
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+
+def bson_default(o):
+    """Encodes the BSON/Python types that show up in Mongo documents."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(default=bson_default, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def stdlib_dumps(obj):
+    return _encoder.encode(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        # orjson handles datetime itself; everything else goes through bson_default
+        return orjson.dumps(obj, default=bson_default, option=_ORJSON_OPTIONS).decode()
+else:
+    dumps = stdlib_dumps
+
+
+def stream_array(docs, chunk_size=100):
+    """
+    Yields a JSON array piece by piece, encoding chunk_size documents at a
+    time, so a cursor can be sent without holding the whole result.
+    """
+    yield "["
+    chunk = []
+    first = True
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            body = dumps(chunk)[1:-1]
+            yield body if first else "," + body
+            first = False
+            chunk = []
+    if chunk:
+        body = dumps(chunk)[1:-1]
+        yield body if first else "," + body
+    yield "]"
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes ObjectId, datetime and Decimal128
+    natively, so handlers can jsonify Mongo documents without copying them
+    to stringify _id. Uses orjson when it is installed.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # Flask passes compact separators for normal responses and indent in
+        # debug mode; only the pretty-printed case needs the stdlib encoder
+        if kwargs.get("indent") is not None:
+            kwargs.setdefault("default", bson_default)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
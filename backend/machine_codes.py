@@ -0,0 +1,100 @@
+import logging
+import re
+import threading
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+log = logging.getLogger("heavyhorizon.machine_codes")
+
+# Category -> machine code prefix (e.g. "EXE-0007")
+PREFIX_MAP = {
+    "Backhoe Loader": "BL",
+    "Excavator": "EXE",
+    "Backhoe Loader with Breaker": "BLB"
+}
+
+COUNTERS_COLLECTION = "counters"
+CODE_INDEX_NAME = "machineCode_unique"
+
+_setup_lock = threading.Lock()
+_setup_done = set()
+
+
+def counter_id(prefix):
+    return f"machineCode:{prefix}"
+
+
+def format_code(prefix, num):
+    return f"{prefix}-{num:04d}"
+
+
+def parse_code(code, prefix):
+    """Returns the numeric part of a "<prefix>-NNNN" code, or None."""
+    if not isinstance(code, str):
+        return None
+    m = re.match(rf"^{re.escape(prefix)}-(\d+)$", code)
+    return int(m.group(1)) if m else None
+
+
+def ensure_code_index(db):
+    """
+    Unique index on machineCode. Machines in categories without a prefix have
+    no code, so the index only covers documents where it is a string.
+    """
+    try:
+        db["machines"].create_index(
+            "machineCode",
+            name=CODE_INDEX_NAME,
+            unique=True,
+            partialFilterExpression={"machineCode": {"$type": "string"}}
+        )
+    except OperationFailure as e:
+        # Most likely existing duplicate codes; run migrate_codes.py to fix them
+        log.error("Could not create unique machineCode index: %s", e)
+
+
+def seed_counters(db):
+    """
+    Raises each prefix counter to the highest code already in use. Uses $max,
+    so running it again (or concurrently) never moves a counter backwards.
+    """
+    machines = db["machines"]
+    counters = db[COUNTERS_COLLECTION]
+    for prefix in PREFIX_MAP.values():
+        highest = 0
+        # Anchored prefix regex plus the $type predicate lets this use the
+        # partial machineCode index
+        for m in machines.find({"machineCode": {"$type": "string", "$regex": f"^{prefix}-"}}, {"machineCode": 1, "_id": 0}):
+            num = parse_code(m.get("machineCode"), prefix)
+            if num is not None and num > highest:
+                highest = num
+        counters.update_one({"_id": counter_id(prefix)}, {"$max": {"seq": highest}}, upsert=True)
+
+
+def ensure_code_setup(db, force=False):
+    """Creates the index and seeds the counters once per process (per database)."""
+    key = (id(db.client), db.name)
+    with _setup_lock:
+        if key in _setup_done and not force:
+            return
+        ensure_code_index(db)
+        seed_counters(db)
+        _setup_done.add(key)
+
+
+def next_machine_code(db, category):
+    """
+    Atomically allocates the next code for a category, or returns None if the
+    category has no prefix.
+    """
+    prefix = PREFIX_MAP.get(category)
+    if not prefix:
+        return None
+    ensure_code_setup(db)
+    counter = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": counter_id(prefix)},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return format_code(prefix, counter["seq"])
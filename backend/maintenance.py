@@ -0,0 +1,216 @@
+import argparse
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Batched, resumable data maintenance. A Migration plans its changes from a
+# single projection query sorted by _id, so the same data always produces
+# the same plan. The runner either prints that plan as a diff (--dry-run) or
+# applies it with chunked, unordered bulk_write calls, checkpointing in
+# maintenance_runs after every chunk so an interrupted run can --resume.
+#
+# Every update is guarded by the values the plan was made from: a document
+# edited since planning (or already updated by an earlier attempt) no longer
+# matches and is reported as skipped instead of being overwritten.
+
+CHECKPOINT_COLLECTION = "maintenance_runs"
+CATALOG_VERSIONS_ID = "catalog_versions"  # same document app.py bumps on admin writes
+DEFAULT_BATCH_SIZE = 500
+DIFF_WIDTH = 160
+
+
+class Change:
+    """New values for some fields of one document, with the values they replace."""
+
+    __slots__ = ("doc_id", "set", "unset", "before", "label")
+
+    def __init__(self, doc_id, before, set=None, unset=(), label=None):
+        self.doc_id = doc_id
+        self.before = before
+        self.set = set or {}
+        self.unset = list(unset)
+        self.label = label
+
+    def operation(self):
+        update = {}
+        if self.set:
+            update["$set"] = self.set
+        if self.unset:
+            update["$unset"] = {field: "" for field in self.unset}
+        # None also matches a missing field, which is what the plan saw
+        return UpdateOne({"_id": self.doc_id, **self.before}, update)
+
+    def to_doc(self):
+        return {"_id": self.doc_id, "before": self.before, "set": self.set, "unset": self.unset, "label": self.label}
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(doc["_id"], doc["before"], doc.get("set"), doc.get("unset", ()), doc.get("label"))
+
+    def diff_lines(self):
+        name = f"{self.doc_id}" + (f" ({self.label})" if self.label else "")
+        lines = []
+        for field, value in self.set.items():
+            lines.append(f"{name} {field}: {shorten(self.before.get(field))} -> {shorten(value)}")
+        for field in self.unset:
+            lines.append(f"{name} {field}: {shorten(self.before.get(field))} -> (removed)")
+        return lines
+
+
+def shorten(value):
+    text = repr(value)
+    return text if len(text) <= DIFF_WIDTH else text[:DIFF_WIDTH - 3] + "..."
+
+
+class Migration:
+    """
+    Subclasses set name, collection and projection and implement plan().
+
+    Plans that depend on the whole collection (code numbering) set
+    frozen_plan: the plan is stored with the checkpoint and a resumed run
+    applies exactly that plan. Otherwise a resumed run re-plans only the
+    documents after the last checkpointed _id.
+    """
+
+    name = None
+    collection = None
+    projection = None
+    frozen_plan = False
+
+    def plan(self, db, docs):
+        """docs is a list of projected documents in _id order. Yields Changes."""
+        raise NotImplementedError
+
+    def before_apply(self, db, changes):
+        """Called once before the first chunk is written (again on resume)."""
+
+    def after_apply(self, db):
+        """Called once the whole plan has been written."""
+
+
+def load_docs(db, migration, after_id=None):
+    query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+    return list(db[migration.collection].find(query, migration.projection).sort("_id", 1))
+
+
+def bump_catalog_version(db, collection_name):
+    """Lets running app workers drop cached reads and ETags for the collection."""
+    db["catalog_meta"].update_one(
+        {"_id": CATALOG_VERSIONS_ID},
+        {
+            "$inc": {f"{collection_name}.version": 1},
+            "$set": {f"{collection_name}.updatedAt": datetime.now(timezone.utc)}
+        },
+        upsert=True
+    )
+
+
+def run(db, migration, dry_run=False, resume=False, restart=False, batch_size=DEFAULT_BATCH_SIZE, out=print):
+    """
+    Plans and (unless dry_run) applies one migration. Returns a summary dict.
+    Refuses to start over an unfinished run unless resume or restart is set.
+    """
+    runs = db[CHECKPOINT_COLLECTION]
+    checkpoint = runs.find_one({"_id": migration.name})
+    unfinished = checkpoint is not None and checkpoint.get("status") == "running"
+    if unfinished and not (resume or restart or dry_run):
+        raise SystemExit(
+            f"{migration.name}: an earlier run stopped after {checkpoint.get('lastId')}; "
+            "pass --resume to continue it or --restart to plan again"
+        )
+    resuming = unfinished and resume and not restart
+    last_id = checkpoint.get("lastId") if resuming else None
+
+    if resuming and migration.frozen_plan:
+        changes = [Change.from_doc(c) for c in checkpoint.get("plan", [])]
+    else:
+        changes = list(migration.plan(db, load_docs(db, migration, last_id)))
+    if last_id is not None:
+        changes = [c for c in changes if c.doc_id > last_id]
+
+    summary = {"migration": migration.name, "planned": len(changes), "modified": 0, "skipped": 0, "errors": 0}
+    if dry_run:
+        for change in changes:
+            for line in change.diff_lines():
+                out(line)
+        out(f"{migration.name}: {len(changes)} document(s) would change (dry run, nothing written)")
+        return summary
+
+    now = datetime.now(timezone.utc)
+    if not resuming:
+        runs.replace_one({"_id": migration.name}, {
+            "status": "running",
+            "startedAt": now,
+            "updatedAt": now,
+            "planned": len(changes),
+            "modified": 0,
+            "skipped": 0,
+            "lastId": None,
+            "plan": [c.to_doc() for c in changes] if migration.frozen_plan else None,
+        }, upsert=True)
+    elif changes:
+        out(f"{migration.name}: resuming after {last_id}, {len(changes)} document(s) left")
+
+    if changes:
+        migration.before_apply(db, changes)
+    collection = db[migration.collection]
+    for start in range(0, len(changes), batch_size):
+        chunk = changes[start:start + batch_size]
+        errors = []
+        try:
+            result = collection.bulk_write([c.operation() for c in chunk], ordered=False)
+            matched, modified = result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            matched, modified = e.details.get("nMatched", 0), e.details.get("nModified", 0)
+            errors = e.details.get("writeErrors", [])
+        skipped = len(chunk) - matched - len(errors)
+        summary["modified"] += modified
+        summary["skipped"] += skipped
+        if modified:
+            bump_catalog_version(db, migration.collection)
+
+        progress = {"$set": {"updatedAt": datetime.now(timezone.utc)}, "$inc": {"modified": modified, "skipped": skipped}}
+        if errors:
+            # Leave lastId before this chunk; the guards make redoing it safe
+            runs.update_one({"_id": migration.name}, progress)
+            summary["errors"] = len(errors)
+            for err in errors:
+                out(f"ERROR: {chunk[err['index']].doc_id}: {err.get('errmsg')}")
+            raise SystemExit(f"{migration.name}: stopped with {len(errors)} write error(s); fix them and pass --resume")
+        progress["$set"]["lastId"] = chunk[-1].doc_id
+        runs.update_one({"_id": migration.name}, progress)
+        out(f"{migration.name}: {start + len(chunk)}/{len(changes)} written ({summary['modified']} modified, {summary['skipped']} skipped)")
+
+    migration.after_apply(db)
+    runs.update_one(
+        {"_id": migration.name},
+        {"$set": {"status": "done", "finishedAt": datetime.now(timezone.utc), "plan": None}}
+    )
+    out(f"{migration.name}: done, {summary['modified']} modified, {summary['skipped']} skipped (changed since planning)")
+    return summary
+
+
+def main(migrations, description=None, argv=None):
+    """Command line shared by the maintenance scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--dry-run", action="store_true", help="print the planned changes without writing")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its checkpoint")
+    parser.add_argument("--restart", action="store_true", help="discard an interrupted run and plan again")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per bulk_write")
+    if len(migrations) > 1:
+        parser.add_argument("only", nargs="*", metavar="MIGRATION",
+                            help="run only these (default: all of %s)" % ", ".join(m.name for m in migrations))
+    args = parser.parse_args(argv)
+    unknown = set(getattr(args, "only", None) or ()) - {m.name for m in migrations}
+    if unknown:
+        parser.error("unknown migration: " + ", ".join(sorted(unknown)))
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client[os.getenv("MONGO_DB_NAME", "heavyhorizon")]
+    selected = [m for m in migrations if not getattr(args, "only", None) or m.name in args.only]
+    for migration in selected:
+        run(db, migration, dry_run=args.dry_run, resume=args.resume, restart=args.restart,
+            batch_size=max(1, args.batch_size))
@@ -0,0 +1,327 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from pymongo import monitoring
+
+# Request instrumentation: per-route latency / size histograms, Mongo command
+# timing (via a PyMongo CommandListener) and Cloudinary call timing, rendered
+# in the Prometheus text format by /metrics. Metrics are per process; with
+# several gunicorn workers each scrape sees the worker that answered it, so
+# scrape every worker or aggregate with the usual `sum by` queries.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Slow-request log: off unless SLOW_REQUEST_MS is set; SLOW_REQUEST_SAMPLE
+# is the fraction of slow requests that get logged
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 0))
+SLOW_REQUEST_SAMPLE = float(os.getenv("SLOW_REQUEST_SAMPLE", 1.0))
+
+slow_log = logging.getLogger("heavyhorizon.slow_requests")
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{escape_label(v)}"' for n, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """fn() -> list of exposition lines, called on every scrape."""
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                lines.extend(fn())
+            except Exception as e:
+                lines.append(f"# collector failed: {escape_label(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"), LATENCY_BUCKETS)
+http_size = registry.histogram(
+    "http_response_size_bytes", "Response body size by route", ("method", "route"), SIZE_BUCKETS)
+http_mongo_time = registry.histogram(
+    "http_request_mongo_seconds", "Mongo time spent per request", ("route",), MONGO_BUCKETS)
+mongo_duration = registry.histogram(
+    "mongo_command_duration_seconds", "Mongo command latency", ("command", "collection"), MONGO_BUCKETS)
+mongo_failures = registry.counter(
+    "mongo_command_failures_total", "Failed Mongo commands", ("command", "collection"))
+mongo_documents = registry.counter(
+    "mongo_documents_total", "Documents returned or written by Mongo commands", ("command", "collection"))
+cloudinary_duration = registry.histogram(
+    "cloudinary_call_duration_seconds", "Cloudinary API latency", ("operation", "outcome"), LATENCY_BUCKETS)
+
+
+class RequestStats:
+    """Per-request totals the listeners add to."""
+
+    __slots__ = ("mongo_seconds", "mongo_commands", "mongo_documents", "cloudinary_seconds", "cloudinary_calls", "_lock")
+
+    def __init__(self):
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        self.mongo_documents = 0
+        self.cloudinary_seconds = 0.0
+        self.cloudinary_calls = 0
+        self._lock = threading.Lock()
+
+    def add_mongo(self, seconds, documents):
+        with self._lock:
+            self.mongo_seconds += seconds
+            self.mongo_commands += 1
+            self.mongo_documents += documents
+
+    def add_cloudinary(self, seconds):
+        with self._lock:
+            self.cloudinary_seconds += seconds
+            self.cloudinary_calls += 1
+
+
+# Set for the duration of a request (a thread under Flask, a task under ASGI)
+current_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def reply_document_count(command_name, reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command_name in ("insert", "update", "delete"):
+        return int(reply.get("n", 0))
+    return 0
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Times every command and attributes it to the request being served.
+    Pass it in event_listeners when building a (Async)MongoClient.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return (event.request_id, event.operation_id, str(event.connection_id))
+
+    def started(self, event):
+        # getMore names the cursor id first and the collection separately
+        key = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(key)
+        collection = collection if isinstance(collection, str) else ""
+        with self._lock:
+            self._collections[self._key(event)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._collections.pop(self._key(event), "")
+        return (event.command_name, collection), event.duration_micros / 1e6
+
+    def succeeded(self, event):
+        labels, seconds = self._finish(event)
+        documents = reply_document_count(event.command_name, event.reply)
+        mongo_duration.observe(labels, seconds)
+        if documents:
+            mongo_documents.inc(labels, documents)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.add_mongo(seconds, documents)
+
+    def failed(self, event):
+        labels, seconds = self._finish(event)
+        mongo_duration.observe(labels, seconds)
+        mongo_failures.inc(labels)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.add_mongo(seconds, 0)
+
+
+def timed_cloudinary(operation, fn, per_request=True):
+    """
+    Wraps a Cloudinary call. With per_request the current request's stats
+    are captured when the wrapper is made, so calls running on a thread pool
+    still count toward that request; background workers pass False.
+    """
+    stats = current_stats.get() if per_request else None
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            cloudinary_duration.observe((operation, outcome), seconds)
+            if stats is not None:
+                stats.add_cloudinary(seconds)
+    return wrapper
+
+
+def record_request(method, route, status, seconds, size, stats, path=""):
+    http_duration.observe((method, route, str(status)), seconds)
+    if size is not None:
+        http_size.observe((method, route), size)
+    if stats is not None:
+        http_mongo_time.observe((route,), stats.mongo_seconds)
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS and random.random() < SLOW_REQUEST_SAMPLE:
+        entry = {
+            "method": method, "route": route, "path": path, "status": status,
+            "durationMs": round(seconds * 1000, 1), "bytes": size,
+        }
+        if stats is not None:
+            entry.update({
+                "mongoMs": round(stats.mongo_seconds * 1000, 1),
+                "mongoCommands": stats.mongo_commands,
+                "mongoDocuments": stats.mongo_documents,
+                "cloudinaryMs": round(stats.cloudinary_seconds * 1000, 1),
+                "cloudinaryCalls": stats.cloudinary_calls,
+            })
+        slow_log.warning(json.dumps(entry))
+
+
+def instrument_flask(app):
+    """Times every Flask request, labelled by its URL rule rather than the raw path."""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_stats = RequestStats()
+        g.metrics_token = current_stats.set(g.metrics_stats)
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        stats = g.pop("metrics_stats", None)
+        token = g.pop("metrics_token", None)
+        method = request.method
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        path = request.path
+        status = response.status_code
+
+        def finish():
+            record_request(method, route, status, time.perf_counter() - start, size, stats, path)
+            if token is not None:
+                try:
+                    current_stats.reset(token)
+                except ValueError:
+                    pass  # closed from a different context
+
+        if response.is_streamed:
+            # Exports stream from the cursor, so time them until the last chunk
+            size = None
+            response.call_on_close(finish)
+        else:
+            size = response.calculate_content_length()
+            finish()
+        return response
+
+
+def metrics_collectors(catalog_cache, auth_timings):
+    """Exposes the existing catalog cache and auth counters on /metrics."""
+
+    def cache_lines():
+        stats = catalog_cache.stats()
+        lines = ["# TYPE catalog_cache_events_total counter"]
+        for event in ("hits", "misses", "evictions", "invalidations"):
+            lines.append(f'catalog_cache_events_total{{event="{event}"}} {stats[event]}')
+        lines += ["# TYPE catalog_cache_entries gauge", f"catalog_cache_entries {stats['entries']}"]
+        return lines
+
+    def auth_lines():
+        lines = ["# TYPE auth_operation_seconds summary"]
+        for name, s in sorted(auth_timings.snapshot().items()):
+            lines.append(f'auth_operation_seconds_sum{{operation="{name}"}} {s["totalMs"] / 1000}')
+            lines.append(f'auth_operation_seconds_count{{operation="{name}"}} {s["count"]}')
+        return lines
+
+    return [cache_lines, auth_lines]
@@ -1,72 +1,69 @@
-import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from machine_codes import COUNTERS_COLLECTION, PREFIX_MAP, counter_id, ensure_code_index, format_code, parse_code
+import maintenance
 
-load_dotenv()
+# Gives every machine in a prefixed category a "<prefix>-NNNN" code. Run with
+# --dry-run first to see the plan; see maintenance.py for --resume/--restart.
 
-# MongoDB connection
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["heavyhorizon"]
-machines_col = db["machines"]
+class MachineCodeMigration(maintenance.Migration):
+    """
+    Machines are walked in _id order. A machine keeps its code if it is well
+    formed for its category and not already taken by an older machine;
+    everything else (missing codes, legacy EX-XXXX, wrong prefix, duplicates)
+    gets the next number above both the highest existing code and the
+    counter, so codes of deleted machines are never handed out again.
+    """
 
-PREFIX_MAP = {
-    "Backhoe Loader": "BL",
-    "Excavator": "EXE",
-    "Backhoe Loader with Breaker": "BLB"
-}
+    name = "machine_codes"
+    collection = "machines"
+    projection = {"category": 1, "machineCode": 1, "title": 1}
+    # Numbering depends on every machine, so a resumed run must reuse the plan
+    frozen_plan = True
 
-def migrate():
-    print("Starting migration...")
-    
-    # 1. Clear machine codes if they don't match the new format logic
-    # Actually, let's just re-generate all or fix the ones that need fixing.
-    # To be safe, let's just ensure all machines have a code matching the map.
-    
-    # Track counters per prefix to ensure uniqueness
-    counters = {prefix: 0 for prefix in PREFIX_MAP.values()}
-    
-    # Also handle legacy prefixes like 'EX'
-    for machine in machines_col.find():
-        category = machine.get("category")
-        current_code = machine.get("machineCode")
-        
-        prefix = PREFIX_MAP.get(category)
-        if not prefix:
-            print(f"Skipping machine {machine.get('title')} - category '{category}' not in prefix map")
-            continue
-            
-        # Determine if we should update
-        needs_update = False
-        if not current_code:
-            needs_update = True
-        elif current_code.startswith("EX-"):
-            needs_update = True # Migrate EX-XXXX to EXE-XXXX
-        elif not current_code.startswith(f"{prefix}-"):
-            needs_update = True # Wrong prefix for category
-            
-        if needs_update:
-            # Generate next number for this prefix
-            # Find the highest existing for THIS PREFIX in the DB currently
-            counters[prefix] += 1
-            new_code = f"{prefix}-{counters[prefix]:04d}"
-            
-            # Ensure new_code isn't already taken (if we are doing partial migration)
-            while machines_col.find_one({"machineCode": new_code}):
-                counters[prefix] += 1
-                new_code = f"{prefix}-{counters[prefix]:04d}"
-                
-            print(f"Updating '{machine.get('title')}' ({category}): {current_code} -> {new_code}")
-            machines_col.update_one({"_id": machine["_id"]}, {"$set": {"machineCode": new_code}})
-        else:
-            # Sync our local counter with existing valid code
-            try:
-                num_part = int(current_code.split("-")[1])
-                if num_part > counters[prefix]:
-                    counters[prefix] = num_part
-            except (IndexError, ValueError):
-                pass
+    def __init__(self, out=print):
+        self.out = out
+
+    def plan(self, db, docs):
+        highest = {}
+        for prefix in PREFIX_MAP.values():
+            counter = db[COUNTERS_COLLECTION].find_one({"_id": counter_id(prefix)}) or {}
+            highest[prefix] = counter.get("seq", 0)
+            for doc in docs:
+                num = parse_code(doc.get("machineCode"), prefix)
+                if num is not None and num > highest[prefix]:
+                    highest[prefix] = num
+
+        taken = set()
+        for doc in docs:
+            category = doc.get("category")
+            current_code = doc.get("machineCode")
+            prefix = PREFIX_MAP.get(category)
+            if not prefix:
+                self.out(f"Skipping machine {doc.get('title')} - category '{category}' not in prefix map")
+                continue
+            if parse_code(current_code, prefix) is not None and current_code not in taken:
+                taken.add(current_code)
+                continue
+            highest[prefix] += 1
+            new_code = format_code(prefix, highest[prefix])
+            taken.add(new_code)
+            yield maintenance.Change(
+                doc["_id"], {"machineCode": current_code}, {"machineCode": new_code},
+                label=f"{doc.get('title')}, {category}"
+            )
+
+    def before_apply(self, db, changes):
+        # Move the counters past the planned codes so machines added while
+        # the migration runs cannot be given one of them
+        codes = [change.set["machineCode"] for change in changes]
+        for prefix in PREFIX_MAP.values():
+            nums = [n for n in (parse_code(code, prefix) for code in codes) if n is not None]
+            if nums:
+                db[COUNTERS_COLLECTION].update_one({"_id": counter_id(prefix)}, {"$max": {"seq": max(nums)}}, upsert=True)
+
+    def after_apply(self, db):
+        # Retry the unique index in case duplicates blocked it before the migration
+        ensure_code_index(db)
 
-    print("Migration completed.")
 
 if __name__ == "__main__":
-    migrate()
+    maintenance.main([MachineCodeMigration()], description="Assign machine codes in bulk")
@@ -0,0 +1,108 @@
+import os
+import threading
+import pymongo
+
+
+class LazyMongo:
+    """
+    Shared MongoClient created on first use instead of at import, so
+    importing the app never does DNS (mongodb+srv) or network work.
+    """
+
+    def __init__(self, uri=None, db_name="heavyhorizon", **client_kwargs):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_kwargs = client_kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = pymongo.MongoClient(self.uri or os.getenv("MONGO_URI"), **self.client_kwargs)
+        return self._client
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def get_db(self):
+        return self.client[self.db_name]
+
+    def ping(self, timeout=2):
+        """Round-trips to the server, giving up after timeout seconds."""
+        with pymongo.timeout(timeout):
+            self.client.admin.command("ping")
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+class LazyAsyncMongo:
+    """
+    AsyncMongoClient for the ASGI app. The client belongs to the event loop
+    it was created on, so it is built on first use inside the running loop
+    (one per worker process) and closed on shutdown.
+    """
+
+    def __init__(self, uri=None, db_name="heavyhorizon", **client_kwargs):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_kwargs = client_kwargs
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = pymongo.AsyncMongoClient(self.uri or os.getenv("MONGO_URI"), **self.client_kwargs)
+        return self._client
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def get_db(self):
+        return self.client[self.db_name]
+
+    def __getitem__(self, name):
+        return self.get_db()[name]
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.close()
+
+
+class LazyDatabase:
+    """Stands in for a Database; resolves the real one on each access."""
+
+    def __init__(self, mongo):
+        self._mongo = mongo
+
+    def __getitem__(self, name):
+        return self._mongo.get_db()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._mongo.get_db(), name)
+
+    def collection(self, name):
+        return LazyCollection(self._mongo, name)
+
+
+class LazyCollection:
+    """Stands in for a Collection so module-level handles don't connect at import."""
+
+    def __init__(self, mongo, name):
+        self._mongo = mongo
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._mongo.get_db()[self._name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants are still served
+    brotli = None
+
+# Text assets worth compressing; images and fonts are already compressed
+COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map", ".xml", ".webmanifest"}
+MIN_COMPRESS_BYTES = 1024
+
+# Vite fingerprints everything under assets/, so those never change in place
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+DEFAULT_CACHE = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=3600")
+INDEX_CACHE = "no-cache"
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings():
+    header = request.headers.get("Accept-Encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def precompress(root, verbose=False):
+    """
+    Writes .gz (and .br when brotli is installed) next to every compressible
+    file under root, skipping variants that are already newer than their
+    source. Returns the number of files written.
+    """
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in COMPRESSIBLE:
+                continue
+            path = os.path.join(dirpath, name)
+            src_mtime = os.path.getmtime(path)
+            if os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            with open(path, "rb") as f:
+                data = None
+                for encoding, suffix in ENCODINGS:
+                    target = path + suffix
+                    if encoding == "br" and brotli is None:
+                        continue
+                    if os.path.exists(target) and os.path.getmtime(target) >= src_mtime:
+                        continue
+                    if data is None:
+                        data = f.read()
+                    body = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+                    # Not worth serving if it barely shrinks
+                    if len(body) >= len(data) * 0.9:
+                        continue
+                    with open(target + ".tmp", "wb") as out:
+                        out.write(body)
+                    os.replace(target + ".tmp", target)
+                    written += 1
+                    if verbose:
+                        print(f"{os.path.relpath(target, root)}: {len(data)} -> {len(body)} bytes")
+    return written
+
+
+class StaticAssets:
+    """
+    Serves the built SPA from dist/:
+      - precompressed .br/.gz variants chosen from Accept-Encoding
+      - immutable caching for fingerprinted files under assets/
+      - ETag, conditional and Range requests through send_file
+      - index.html kept in memory and re-read only when its mtime changes
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._index_lock = threading.Lock()
+        self._index = None  # (mtime_ns, etag, {encoding: bytes})
+
+    def cache_control(self, filename):
+        if filename.startswith("assets/"):
+            return IMMUTABLE_CACHE
+        return DEFAULT_CACHE
+
+    def serve(self, filename):
+        if filename in ("", "index.html"):
+            return self.index_response()
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        send_path, encoding = path, None
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+            accepted = accepted_encodings()
+            for enc, suffix in ENCODINGS:
+                if enc in accepted and os.path.isfile(path + suffix):
+                    send_path, encoding = path + suffix, enc
+                    break
+
+        resp = send_file(send_path, mimetype=mimetype, conditional=True, max_age=None)
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+            resp.vary.add("Accept-Encoding")
+        resp.headers["Cache-Control"] = self.cache_control(filename)
+        return resp
+
+    def _load_index(self):
+        path = os.path.join(self.root, "index.html")
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._index
+        if cached and cached[0] == mtime:
+            return cached
+        with self._index_lock:
+            if self._index and self._index[0] == mtime:
+                return self._index
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = {None: data, "gzip": gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(data, quality=11)
+            self._index = (mtime, hashlib.sha1(data).hexdigest(), variants)
+            return self._index
+
+    def index_response(self):
+        _, etag, variants = self._load_index()
+        accepted = accepted_encodings()
+        encoding = next((enc for enc, _ in ENCODINGS if enc in accepted and enc in variants), None)
+
+        resp = Response(variants[encoding], mimetype="text/html")
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        resp.vary.add("Accept-Encoding")
+        resp.set_etag(f"{etag}-{encoding}" if encoding else etag)
+        resp.headers["Cache-Control"] = INDEX_CACHE
+        return resp.make_conditional(request)
+
+
+if __name__ == "__main__":
+    # Build step: python static_assets.py [dist_dir]
+    import sys
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "dist")
+    print(f"Wrote {precompress(root, verbose=True)} compressed variants")
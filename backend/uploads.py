@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("heavyhorizon.uploads")
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", 30))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", 10 * 1024 * 1024))
+# The Cloudinary SDK reads a file whole before sending it; files above this
+# size are sent in chunks of this size instead (5 MB is Cloudinary's minimum)
+UPLOAD_CHUNK_BYTES = max(int(os.getenv("UPLOAD_CHUNK_BYTES", 6 * 1024 * 1024)), 5 * 1024 * 1024)
+
+# Shared by all requests, so concurrent admins can't exceed UPLOAD_WORKERS
+# simultaneous uploads per process
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+
+class UploadLimitError(ValueError):
+    pass
+
+
+def file_size(file):
+    """Size of an uploaded file without reading it into memory."""
+    stream = getattr(file, "stream", file)
+    pos = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(pos)
+    return size
+
+
+def check_limits(files, max_files=UPLOAD_MAX_FILES, max_file_bytes=UPLOAD_MAX_FILE_BYTES):
+    """Raises UploadLimitError before anything is sent to the uploader."""
+    if not files:
+        raise UploadLimitError("No files provided")
+    if len(files) > max_files:
+        raise UploadLimitError(f"Too many files: {len(files)} (max {max_files})")
+    for f in files:
+        size = file_size(f)
+        if size > max_file_bytes:
+            raise UploadLimitError(f"{f.filename} is {size} bytes (max {max_file_bytes})")
+
+
+def upload_result(i, f, future):
+    result = {"index": i, "filename": getattr(f, "filename", None)}
+    try:
+        result["url"] = future.result()["secure_url"]
+    except Exception as e:
+        log.error("Upload of %s failed: %s", result["filename"], e)
+        result["error"] = str(e)
+    return result
+
+
+def upload_all(files, upload_fn, executor=None):
+    """
+    Uploads files concurrently with upload_fn(file) -> {"secure_url": ...}.
+    Returns one result per file, in the original order:
+      {"index": i, "filename": name, "url": url} or
+      {"index": i, "filename": name, "error": message}
+    The file objects are handed to upload_fn as-is. Each in-flight upload
+    holds up to UPLOAD_CHUNK_BYTES of its file in memory (see
+    upload_to_cloudinary in app.py), so a process holds at most
+    UPLOAD_WORKERS of those at a time.
+    """
+    executor = executor or _executor
+    futures = [executor.submit(upload_fn, f) for f in files]
+    return [upload_result(i, f, future) for i, (f, future) in enumerate(zip(files, futures))]
+
+
+async def upload_all_async(files, upload_fn, executor=None):
+    """
+    upload_all for the ASGI app: the same pool does the (blocking) uploads
+    while the event loop only awaits them.
+    """
+    executor = executor or _executor
+    futures = [executor.submit(upload_fn, f) for f in files]
+    if futures:
+        await asyncio.wait([asyncio.wrap_future(future) for future in futures])
+    return [upload_result(i, f, future) for i, (f, future) in enumerate(zip(files, futures))]
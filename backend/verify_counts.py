@@ -1,15 +1,21 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
+import argparse
 import os
+import dashboard_stats
 
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Show collection counts and check the dashboard counters")
+parser.add_argument("--repair", action="store_true", help="overwrite drifted dashboard counters with the real counts")
+args = parser.parse_args()
+
 uri = os.getenv("MONGO_URI")
 print(f"Connecting to MongoDB: {uri.split('@')[1] if '@' in uri else 'Local/Hidden'}")
 
 try:
     client = MongoClient(uri)
-    db = client["heavyhorizon"]
+    db = client[os.getenv("MONGO_DB_NAME", "heavyhorizon")]
     
     machines = db["machines"].count_documents({})
     parts = db["parts"].count_documents({})
@@ -22,6 +28,14 @@ try:
     print(f"Blogs:    {blogs}")
     print(f"Enquiries:{enquiries}")
     print("-" * 30)
+
+    drift = dashboard_stats.reconcile(db, repair=args.repair)
+    if not drift:
+        print("Dashboard counters are in sync")
+    for field, (stored, actual) in drift.items():
+        print(f"Drift {field}: stored {stored}, actual {actual}")
+    if drift:
+        print("Counters repaired" if args.repair else "Run with --repair to fix")
     
 except Exception as e:
     print(f"Error: {e}")